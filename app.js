@@ -576,27 +576,134 @@ function buildRowsFromFolderStructure(rootName, bySubfolder, frameW, frameH) {
   };
 }
 
-async function drawRowsToSpriteSheet(sheetData) {
-  const { rows, rowFrameCounts, frameW, frameH, outputBase, rootName, objectType } = sheetData;
-  const maxColumns = Math.max(...rowFrameCounts);
+const SHEET_DECODE_CONCURRENCY = Math.max(2, Math.min(8, navigator.hardwareConcurrency || 4));
+
+async function paintSheetRows(ctx, rows, frameW, frameH, concurrency, onProgress) {
+  const tasks = [];
+  rows.forEach((rowFrames, row) => {
+    rowFrames.forEach((file, col) => {
+      if (file) tasks.push({ file, row, col });
+    });
+  });
+  let next = 0;
+  let done = 0;
+  async function drain() {
+    while (next < tasks.length) {
+      const { file, row, col } = tasks[next];
+      next += 1;
+      const bmp = await createImageBitmap(file);
+      ctx.drawImage(bmp, 0, 0, bmp.width, bmp.height, col * frameW, row * frameH, frameW, frameH);
+      bmp.close();
+      done += 1;
+      onProgress(done, tasks.length);
+    }
+  }
+  const lanes = [];
+  for (let lane = 0; lane < Math.min(concurrency, tasks.length); lane += 1) {
+    lanes.push(drain());
+  }
+  await Promise.all(lanes);
+}
+
+function sheetWorkerMain() {
+  self.onmessage = async (message) => {
+    const { rows, width, height, frameW, frameH, concurrency } = message.data;
+    try {
+      const canvas = new OffscreenCanvas(width, height);
+      const ctx = canvas.getContext("2d");
+      ctx.imageSmoothingEnabled = false;
+      await paintSheetRows(ctx, rows, frameW, frameH, concurrency, (done, total) => {
+        self.postMessage({ type: "progress", done, total });
+      });
+      const blob = await canvas.convertToBlob({ type: "image/png" });
+      self.postMessage({ type: "done", blob });
+    } catch (error) {
+      self.postMessage({ type: "error", message: (error && error.message) || String(error) });
+    }
+  };
+}
+
+function canUseSheetWorker() {
+  return (
+    typeof Worker !== "undefined" &&
+    typeof OffscreenCanvas !== "undefined" &&
+    typeof OffscreenCanvas.prototype.convertToBlob === "function"
+  );
+}
+
+function renderSheetInWorker(job, onProgress) {
+  // Blob worker: also works when index.html is opened from file://.
+  const source = `${paintSheetRows.toString()}\n(${sheetWorkerMain.toString()})();`;
+  const url = URL.createObjectURL(new Blob([source], { type: "text/javascript" }));
+  return new Promise((resolve, reject) => {
+    let worker;
+    try {
+      worker = new Worker(url);
+    } catch (error) {
+      URL.revokeObjectURL(url);
+      error.workerUnavailable = true;
+      reject(error);
+      return;
+    }
+    let started = false;
+    const finish = () => {
+      worker.terminate();
+      URL.revokeObjectURL(url);
+    };
+    worker.onmessage = (message) => {
+      const data = message.data;
+      started = true;
+      if (data.type === "progress") {
+        onProgress(data.done, data.total);
+      } else if (data.type === "done") {
+        finish();
+        resolve(data.blob);
+      } else {
+        finish();
+        reject(new Error(data.message));
+      }
+    };
+    worker.onerror = (event) => {
+      finish();
+      const error = new Error(event.message || "Error en el worker de generación");
+      error.workerUnavailable = !started;
+      reject(error);
+    };
+    worker.postMessage(job);
+  });
+}
+
+async function renderSheetOnMainThread(job, onProgress) {
   const outCanvas = document.createElement("canvas");
-  outCanvas.width = maxColumns * frameW;
-  outCanvas.height = rows.length * frameH;
+  outCanvas.width = job.width;
+  outCanvas.height = job.height;
   const outCtx = outCanvas.getContext("2d");
   outCtx.imageSmoothingEnabled = false;
+  await paintSheetRows(outCtx, job.rows, job.frameW, job.frameH, job.concurrency, onProgress);
+  return new Promise((resolve) => outCanvas.toBlob(resolve, "image/png"));
+}
 
-  for (let row = 0; row < rows.length; row += 1) {
-    const rowFrames = rows[row];
-    for (let col = 0; col < maxColumns; col += 1) {
-      const frameFile = rowFrames[col];
-      if (!frameFile) continue;
-      const bmp = await createImageBitmap(frameFile);
-      outCtx.drawImage(bmp, 0, 0, bmp.width, bmp.height, col * frameW, row * frameH, frameW, frameH);
-      bmp.close();
+async function drawRowsToSpriteSheet(sheetData, onProgress = () => {}) {
+  const { rows, rowFrameCounts, frameW, frameH, outputBase, rootName, objectType } = sheetData;
+  const maxColumns = Math.max(...rowFrameCounts);
+  const job = {
+    rows,
+    width: maxColumns * frameW,
+    height: rows.length * frameH,
+    frameW,
+    frameH,
+    concurrency: SHEET_DECODE_CONCURRENCY
+  };
+
+  let blob = null;
+  if (canUseSheetWorker()) {
+    try {
+      blob = await renderSheetInWorker(job, onProgress);
+    } catch (error) {
+      if (!error.workerUnavailable) throw error;
     }
   }
-
-  const blob = await new Promise((resolve) => outCanvas.toBlob(resolve, "image/png"));
+  if (!blob) blob = await renderSheetOnMainThread(job, onProgress);
   if (!blob) throw new Error("No se pudo exportar PNG");
   const url = URL.createObjectURL(blob);
   const img = await loadImage(url);
@@ -680,7 +787,9 @@ async function handleBuildSheet() {
 
     const sheetData = buildRowsFromFolderStructure(parsed.rootName, parsed.bySubfolder, frameW, frameH);
     setBuildStatus("Generando spritesheet...");
-    const generated = await drawRowsToSpriteSheet(sheetData);
+    const generated = await drawRowsToSpriteSheet(sheetData, (done, total) => {
+      setBuildStatus(`Generando spritesheet... ${done}/${total} frames`);
+    });
     addGeneratedAsset(generated);
 
     if (generated.objectType === "weapon") {
@@ -713,6 +822,57 @@ async function checkLocalBuilder() {
   }
 }
 
+function describeJobEvent(event) {
+  switch (event.phase) {
+    case "scan":
+      return "Escaneando carpeta...";
+    case "check":
+      return event.rebuild ? `Cambios detectados (${event.rows} filas)` : "Sin cambios, usando sheet existente";
+    case "precheck":
+      return `Validando ${event.files} PNG...`;
+    case "stitch":
+      return `Armando fila ${event.row}/${event.rows}...`;
+    case "encode":
+      return "Codificando PNG...";
+    case "copy":
+      return "Copiando a targets...";
+    default:
+      return `${event.phase}...`;
+  }
+}
+
+async function runLocalBuildJob(folderPath) {
+  const res = await fetch(`${LOCAL_BUILDER_BASE}/jobs`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ folder_path: folderPath })
+  });
+  const job = await res.json();
+  if (!res.ok || !job.success) {
+    throw new Error(job.error || `HTTP ${res.status}`);
+  }
+  return new Promise((resolve, reject) => {
+    const source = new EventSource(`${LOCAL_BUILDER_BASE}${job.events_url}`);
+    source.onmessage = (message) => {
+      const event = JSON.parse(message.data);
+      if (event.phase === "done") {
+        source.close();
+        resolve(event.result);
+      } else if (event.phase === "error" || event.phase === "cancelled") {
+        source.close();
+        reject(new Error(event.error || event.phase));
+      } else {
+        setBuildStatus(`Builder local: ${describeJobEvent(event)}`);
+      }
+    };
+    source.onerror = () => {
+      if (source.readyState === EventSource.CLOSED) {
+        reject(new Error("Se perdió la conexión con el Builder local."));
+      }
+    };
+  });
+}
+
 async function handleBuildLocal() {
   try {
     const folderPath = (ui.folderPath.value || "").trim();
@@ -720,20 +880,12 @@ async function handleBuildLocal() {
       throw new Error("Ingresa la ruta absoluta de la carpeta (ej: /Users/.../PJ_Gargoyle).");
     }
     setBuildStatus("Enviando tarea al Builder local...");
-    const res = await fetch(`${LOCAL_BUILDER_BASE}/build`, {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ folder_path: folderPath })
-    });
-    const data = await res.json();
-    if (!res.ok || !data.success) {
-      throw new Error(data.error || `HTTP ${res.status}`);
-    }
-    if (!data.png_base64) {
+    const data = await runLocalBuildJob(folderPath);
+    if (!data.sheet_url) {
       throw new Error("Builder local no devolvió imagen.");
     }
 
-    const url = `data:image/png;base64,${data.png_base64}`;
+    const url = `${LOCAL_BUILDER_BASE}${data.sheet_url}`;
     const img = await loadImage(url);
     const generated = {
       id: `${Date.now()}-${Math.random().toString(16).slice(2)}`,
@@ -858,13 +1010,27 @@ function bindEvents() {
     const asset = getSelectedGeneratedAsset();
     await applyGeneratedAssetAsLayer("weaponLeft", asset);
   });
-  ui.downloadGenerated.addEventListener("click", () => {
+  ui.downloadGenerated.addEventListener("click", async () => {
     const asset = getSelectedGeneratedAsset();
     if (!asset) return;
-    const a = document.createElement("a");
-    a.href = asset.url;
-    a.download = asset.name;
-    a.click();
+    try {
+      // Browsers ignore a.download on cross-origin links (sheets served by the
+      // local Builder), so the PNG is fetched and saved through a blob URL.
+      let blob = asset.blob;
+      if (!blob) {
+        const res = await fetch(asset.url);
+        if (!res.ok) throw new Error(`HTTP ${res.status}`);
+        blob = await res.blob();
+      }
+      const url = URL.createObjectURL(blob);
+      const a = document.createElement("a");
+      a.href = url;
+      a.download = asset.name;
+      a.click();
+      setTimeout(() => URL.revokeObjectURL(url), 1000);
+    } catch (error) {
+      setBuildStatus(`Error al descargar ${asset.name}: ${error.message}`, true);
+    }
   });
 
   window.addEventListener("keydown", (e) => {
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+import argparse
+import concurrent.futures
+import hashlib
+import itertools
+import json
+import os
+import re
+import sys
+import time
+
+from build_sprites import DEFAULT_CONFIG, Image, parse_frame_size
+
+BAKE_VERSION = 1
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ASSETS = os.path.join(os.path.dirname(SCRIPT_DIR), "assets")
+DEFAULT_BASE = "character/pj_gargoyle.png"
+INDEX_NAME = "combos.json"
+
+# Mirrors app.js: DIR_INDEX, WEAPON_OPTIONS, TWO_HAND and BUILTIN. A baked sheet
+# must match what render() draws in the simulator frame for frame.
+DIRECTIONS = ("down", "right", "up", "left")
+WEAPONS = ("none", "sword", "axe", "bow", "spear", "orb", "shield", "pickaxe")
+TWO_HAND = ("bow", "spear", "pickaxe")
+SINGLE_FILE_WEAPONS = ("shield", "pickaxe", "bow", "spear")
+HANDED_WEAPONS = ("sword", "axe", "orb")
+ARMOR_SETS = ("none", "crimson", "azure", "emerald")
+ARMOR_PIECES = (("armorBody", "armor"), ("armorHands", "gloves"), ("armorFeet", "boots"), ("armorHead", "hat"))
+# Baked rows follow the hero sheet layout, four directions per action.
+DEFAULT_ACTIONS = ("walk", "attack", "idle")
+BAKE_ACTIONS = ("walk", "attack", "idle", "mine")
+
+
+def weapon_path(assets, weapon, slot):
+    if weapon in SINGLE_FILE_WEAPONS:
+        return os.path.join(assets, "weapons", f"{weapon}.png")
+    if weapon in HANDED_WEAPONS:
+        side = "left" if slot == "hand_l" else "right"
+        return os.path.join(assets, "weapons", f"{weapon}_{side}.png")
+    return None
+
+
+def armor_paths(assets, armor):
+    if armor == "none":
+        return [(layer, None) for layer, _ in ARMOR_PIECES]
+    return [
+        (layer, os.path.join(assets, "armor", f"{armor}_{piece}.png"))
+        for layer, piece in ARMOR_PIECES
+    ]
+
+
+def enforce_weapon_rules(right, left):
+    if right == "shield":
+        right = "none"
+    if left in TWO_HAND:
+        left = "none"
+    if right in TWO_HAND:
+        left = "none"
+    return right, left
+
+
+def resolve_attack_style(right, left, action):
+    if action == "mine":
+        return "pickaxe"
+    types = {right, left}
+    for style in ("bow", "orb", "spear", "pickaxe"):
+        if style in types:
+            return style
+    if types & {"sword", "axe", "shield"}:
+        return "multi"
+    return "normal"
+
+
+def body_attack_base_row(style, base_rows):
+    if style == "multi":
+        return 12
+    if style == "bow":
+        return 16
+    if style == "spear":
+        return 20
+    if style == "orb":
+        return 24
+    if style == "pickaxe":
+        return 24 if base_rows is None else max(0, base_rows - 4)
+    return 4
+
+
+def row_for_body(action, direction, style, base_rows):
+    d = DIRECTIONS.index(direction)
+    if action == "walk":
+        return d
+    if action == "idle":
+        return 8 + d
+    return body_attack_base_row(style, base_rows) + d
+
+
+def row_for_layer(action, direction, attack_base):
+    d = DIRECTIONS.index(direction)
+    if action == "walk":
+        return 4 + d
+    if action == "idle":
+        return d
+    return attack_base + d
+
+
+def normalize_combo(entry, index):
+    if not isinstance(entry, dict):
+        raise ValueError(f"Combo #{index} must be an object")
+    right = entry.get("right", "none")
+    left = entry.get("left", "none")
+    armor = entry.get("armor", "none")
+    for key, value, allowed in (("right", right, WEAPONS), ("left", left, WEAPONS), ("armor", armor, ARMOR_SETS)):
+        if value not in allowed:
+            raise ValueError(f"Combo #{index}: unknown {key} '{value}' (expected one of {', '.join(allowed)})")
+    right, left = enforce_weapon_rules(right, left)
+    name = entry.get("name") or f"{right}_{left}_{armor}"
+    if not re.fullmatch(r"[A-Za-z0-9][A-Za-z0-9_.-]*", name) or name.lower().endswith(".png"):
+        raise ValueError(f"Combo #{index}: invalid name '{name}'")
+    return {"name": name, "right": right, "left": left, "armor": armor}
+
+
+def load_combos(path):
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            data = json.load(handle)
+    except (OSError, json.JSONDecodeError) as exc:
+        raise ValueError(f"Cannot read combos file {path}: {exc}") from exc
+    entries = data.get("combos") if isinstance(data, dict) else data
+    if not isinstance(entries, list):
+        raise ValueError(f"Combos file {path} must hold a list or an object with 'combos'")
+    base = data.get("base") if isinstance(data, dict) else None
+    return base, [normalize_combo(entry, idx) for idx, entry in enumerate(entries)]
+
+
+def all_combos():
+    # Every legal pairing once: the weapon rules collapse illegal ones onto legal names.
+    seen = {}
+    for right, left, armor in itertools.product(WEAPONS, WEAPONS, ARMOR_SETS):
+        combo = normalize_combo({"right": right, "left": left, "armor": armor}, len(seen))
+        seen.setdefault(combo["name"], combo)
+    return list(seen.values())
+
+
+def combo_layout(combo, assets, base_path, base_rows, actions):
+    # One entry per output row: the (path, source row) layers render() would draw,
+    # in its draw order. Layers without a file are dropped up front.
+    right, left = combo["right"], combo["left"]
+    shield_orb_attack = right == "orb" and left == "shield"
+    layers = [
+        ("weaponLeft", weapon_path(assets, left, "hand_l"), 12 if shield_orb_attack and left == "shield" else 8),
+        ("weaponRight", weapon_path(assets, right, "hand_r"), 12 if shield_orb_attack and right == "shield" else 8),
+    ]
+    layers += [(layer, path, 8) for layer, path in armor_paths(assets, combo["armor"])]
+    rows = []
+    for action in actions:
+        style = resolve_attack_style(right, left, action)
+        for direction in DIRECTIONS:
+            row = [(base_path, row_for_body(action, direction, style, base_rows))]
+            row += [
+                (path, row_for_layer(action, direction, attack_base))
+                for _, path, attack_base in layers
+                if path
+            ]
+            rows.append(tuple(row))
+    return tuple(rows)
+
+
+_SHEETS = {}
+
+
+def load_sheet(path):
+    # Each worker decodes a layer sheet once and reuses it for every combo it bakes.
+    sheet = _SHEETS.get(path)
+    if sheet is None:
+        try:
+            with Image.open(path) as image:
+                sheet = image.convert("RGBA")
+        except OSError as exc:
+            raise RuntimeError(f"Cannot decode {path}: {exc}") from exc
+        _SHEETS[path] = sheet
+    return sheet
+
+
+def bake_sheet(task):
+    layout, frame_size, columns, output_path = task
+    width, height = frame_size
+    sheet = Image.new("RGBA", (columns * width, len(layout) * height), (0, 0, 0, 0))
+    for out_row, layers in enumerate(layout):
+        for path, row in layers:
+            source = load_sheet(path)
+            # drawSpriteFrame skips frames that fall outside the source sheet, so
+            # only the whole frames present in this row are composited.
+            frames = min(columns, source.width // width)
+            if frames <= 0 or (row + 1) * height > source.height:
+                continue
+            strip = source.crop((0, row * height, frames * width, (row + 1) * height))
+            sheet.alpha_composite(strip, dest=(0, out_row * height))
+    tmp_path = f"{output_path}.tmp"
+    sheet.save(tmp_path, format="PNG")
+    with open(tmp_path, "rb") as handle:
+        digest = hashlib.sha256(handle.read()).hexdigest()
+    return tmp_path, digest
+
+
+def run_bakes(tasks, jobs):
+    if jobs <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield task, bake_sheet(task)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        # map keeps task order, so which duplicate keeps its file is deterministic.
+        yield from zip(tasks, pool.map(bake_sheet, tasks))
+
+
+def bake_combos(combos, assets, base_path, output_dir, frame_size, actions, jobs):
+    width, height = frame_size
+    try:
+        with Image.open(base_path) as base:
+            base_width, base_height = base.size
+    except OSError as exc:
+        raise RuntimeError(f"Cannot open base sheet {base_path}: {exc}") from exc
+    columns = base_width // width
+    if columns <= 0:
+        raise RuntimeError(f"Base sheet {base_path} is narrower than one {width}x{height} frame")
+    base_rows = base_height // height
+
+    combo_layouts = [
+        (combo, combo_layout(combo, assets, base_path, base_rows, actions)) for combo in combos
+    ]
+    paths = sorted({path for _, layout in combo_layouts for row in layout for path, _ in row})
+    missing = [path for path in paths if not os.path.isfile(path)]
+    if missing:
+        raise RuntimeError(f"Missing layer sheet(s): {', '.join(missing)}")
+    # Byte-identical layer files (e.g. recoloured sets that are still placeholders)
+    # are folded onto one path, then combos that resolve to the same layers and
+    # rows share one bake.
+    canonical = {}
+    for path in paths:
+        with open(path, "rb") as handle:
+            digest = hashlib.sha256(handle.read()).hexdigest()
+        canonical[path] = canonical.setdefault(digest, path)
+    layouts = {}
+    for combo, layout in combo_layouts:
+        layout = tuple(tuple((canonical[path], row) for path, row in layers) for layers in layout)
+        layouts.setdefault(layout, []).append(combo)
+
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = [
+        (layout, tuple(frame_size), columns, os.path.join(output_dir, f"{group[0]['name']}.png"))
+        for layout, group in layouts.items()
+    ]
+    names_by_path = {task[3]: layouts[task[0]] for task in tasks}
+    # Different layouts can still flatten to the same pixels (e.g. a layer whose rows
+    # are all out of bounds); the first one keeps its file and the rest point at it.
+    files_by_digest = {}
+    index = {}
+    for task, (tmp_path, digest) in run_bakes(tasks, jobs):
+        output_path = task[3]
+        file_name = files_by_digest.get(digest)
+        if file_name is None:
+            os.replace(tmp_path, output_path)
+            file_name = os.path.basename(output_path)
+            files_by_digest[digest] = file_name
+        else:
+            os.remove(tmp_path)
+        for combo in names_by_path[output_path]:
+            index[combo["name"]] = {
+                "file": file_name,
+                "right": combo["right"],
+                "left": combo["left"],
+                "armor": combo["armor"],
+                "attack_style": resolve_attack_style(combo["right"], combo["left"], "attack"),
+            }
+
+    rows = [
+        {"action": action, "direction": direction}
+        for action in actions
+        for direction in DIRECTIONS
+    ]
+    data = {
+        "version": BAKE_VERSION,
+        "base": os.path.relpath(base_path, assets),
+        "frame_size": list(frame_size),
+        "columns": columns,
+        "rows": rows,
+        "combos": {name: index[name] for name in sorted(index)},
+        "files": sorted(set(files_by_digest.values())),
+    }
+    index_path = os.path.join(output_dir, INDEX_NAME)
+    tmp_path = f"{index_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(data, handle, indent=2)
+        handle.write("\n")
+    os.replace(tmp_path, index_path)
+    return data, len(layouts)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Pre-composite equipment combinations into flattened sprite sheets."
+    )
+    parser.add_argument(
+        "--combos",
+        help='JSON file with {"base": ..., "combos": [{"name", "right", "left", "armor"}]}.',
+    )
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="Bake every legal weapon/armor combination.",
+    )
+    parser.add_argument(
+        "--assets",
+        default=DEFAULT_ASSETS,
+        help="Assets folder with character/, weapons/ and armor/ (default: ../assets).",
+    )
+    parser.add_argument(
+        "--base",
+        help=f"Base character sheet, relative to --assets (default: {DEFAULT_BASE}).",
+    )
+    parser.add_argument("--output", default="baked_combos", help="Folder for the baked sheets.")
+    parser.add_argument(
+        "--actions",
+        default=",".join(DEFAULT_ACTIONS),
+        help=f"Comma-separated actions to bake, in row order ({', '.join(BAKE_ACTIONS)}).",
+    )
+    parser.add_argument(
+        "--frame-size",
+        type=parse_frame_size,
+        default=DEFAULT_CONFIG["frame_size"],
+        help="Frame size as WxH (default: 128x128).",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Combos to bake in parallel (default: CPU count).",
+    )
+    args = parser.parse_args()
+
+    if Image is None:
+        print("Error: bake_combos.py requires Pillow (pip install pillow)", file=sys.stderr)
+        return 1
+    if not args.combos and not args.all:
+        print("Error: pass --combos FILE and/or --all", file=sys.stderr)
+        return 1
+    if args.jobs < 1:
+        print("Error: --jobs must be >= 1", file=sys.stderr)
+        return 1
+    actions = [action.strip() for action in args.actions.split(",") if action.strip()]
+    unknown = [action for action in actions if action not in BAKE_ACTIONS]
+    if not actions or unknown or len(set(actions)) != len(actions):
+        print(f"Error: --actions must list distinct actions from {', '.join(BAKE_ACTIONS)}", file=sys.stderr)
+        return 1
+
+    assets = os.path.abspath(args.assets)
+    base = args.base
+    combos = []
+    try:
+        if args.combos:
+            file_base, combos = load_combos(args.combos)
+            base = base or file_base
+        if args.all:
+            named = {combo["name"] for combo in combos}
+            combos += [combo for combo in all_combos() if combo["name"] not in named]
+    except ValueError as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+    names = [combo["name"] for combo in combos]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        print(f"Error: duplicate combo name(s): {', '.join(duplicates)}", file=sys.stderr)
+        return 1
+    base_path = os.path.join(assets, base or DEFAULT_BASE)
+
+    start = time.perf_counter()
+    try:
+        data, baked = bake_combos(
+            combos, assets, base_path, args.output, args.frame_size, actions, args.jobs
+        )
+    except (RuntimeError, OSError) as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+    print(
+        f"Baked {len(data['combos'])} combo(s) into {len(data['files'])} sheet(s) "
+        f"({baked} unique layout(s)) in {time.perf_counter() - start:.1f}s -> {args.output}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+import argparse
+import copy
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import struct
+import sys
+import tempfile
+import time
+import zlib
+
+from build_sprites import (
+    DEFAULT_CONFIG,
+    Image,
+    PNG_SIGNATURE,
+    apply_frames_overrides,
+    build_sprite_sheet,
+    classify_folder,
+    config_fingerprint,
+    copy_to_targets,
+    find_magick,
+    fingerprint_inputs,
+    load_manifest,
+    manifest_path_for,
+    needs_rebuild,
+    output_name_for_folder,
+    parse_frame_size,
+    plan_build,
+    png_chunk,
+    precheck_pngs,
+    validate_output_base,
+    write_manifest,
+)
+
+BENCH_VERSION = 2
+# Folder prefix per --<kind> count; names must classify like a real library.
+LIBRARY_KINDS = (
+    ("heroes", "PJ_hero"),
+    ("weapons", "W_weapon"),
+    ("enemies", "E1_enemy"),
+    ("npcs", "NPC_npc"),
+    ("items", "I_item"),
+)
+ACTION_FOLDERS = {"idle": "idle", "walk": "walk", "attack": "Attack"}
+AUTO_FRAMES_PER_VIEW = 8
+PHASES = (
+    "scan",
+    "check",
+    "check_cold",
+    "precheck",
+    "stitch_montage",
+    "stitch_append",
+    "stitch_native",
+    "stitch_stream",
+    "copy",
+    "copy_unchanged",
+)
+STITCH_MODES = ("montage", "append", "native", "stream")
+
+
+def write_png(path, width, height, pixels):
+    # Plain RGBA, filter 0 on every scanline: the generator must not depend on Pillow.
+    stride = width * 4
+    raw = b"".join(
+        b"\x00" + pixels[y * stride : (y + 1) * stride] for y in range(height)
+    )
+    with open(path, "wb") as handle:
+        handle.write(PNG_SIGNATURE)
+        handle.write(png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)))
+        handle.write(png_chunk(b"IDAT", zlib.compress(raw, 6)))
+        handle.write(png_chunk(b"IEND", b""))
+
+
+def synthetic_frame(rng, width, height):
+    # A few opaque rectangles on a transparent background, like a trimmed sprite. The
+    # background keeps a colour under alpha 0, as many exporters leave it.
+    background = bytes((rng.randrange(256), rng.randrange(256), rng.randrange(256), 0))
+    pixels = bytearray(background * (width * height))
+    for _ in range(3):
+        color = bytes((rng.randrange(256), rng.randrange(256), rng.randrange(256), 255))
+        x0 = rng.randrange(width // 2)
+        y0 = rng.randrange(height // 2)
+        x1 = x0 + rng.randrange(1, width - x0 + 1)
+        y1 = y0 + rng.randrange(1, height - y0 + 1)
+        span = color * (x1 - x0)
+        for y in range(y0, y1):
+            offset = (y * width + x0) * 4
+            pixels[offset : offset + len(span)] = span
+    return bytes(pixels)
+
+
+def frames_for(profile, frames_key):
+    desired = profile.get("frames_per_view", {}).get(frames_key)
+    if desired in (None, "auto"):
+        return AUTO_FRAMES_PER_VIEW
+    return desired
+
+
+def generate_library(root, counts, config, seed):
+    rng = random.Random(seed)
+    width, height = config["frame_size"]
+    folders = []
+    for kind, prefix in LIBRARY_KINDS:
+        for number in range(1, counts[kind] + 1):
+            name = f"{prefix}{number:02d}"
+            object_type = classify_folder(name, config.get("type_overrides", {}))
+            profile = config["profiles"][object_type]
+            directions = profile.get("input_direction_order", config["input_direction_order"])
+            folder_path = os.path.join(root, name)
+            for action in profile["actions"]:
+                action_dir = os.path.join(folder_path, ACTION_FOLDERS[action])
+                os.makedirs(action_dir, exist_ok=True)
+                total = frames_for(profile, action) * len(directions)
+                for frame in range(total):
+                    write_png(
+                        os.path.join(action_dir, f"frame_{frame:03d}.png"),
+                        width,
+                        height,
+                        synthetic_frame(rng, width, height),
+                    )
+            folders.append((name, folder_path, object_type, profile))
+    return folders
+
+
+def folder_settings(name, profile, config):
+    input_direction_order = profile.get("input_direction_order", config["input_direction_order"])
+    attack_extra_folders = (
+        config.get("attack_extra_folders", []) if name.lower() == "w_shield" else []
+    )
+    return input_direction_order, attack_extra_folders
+
+
+def plan_folder(name, path, profile, config):
+    input_direction_order, attack_extra_folders = folder_settings(name, profile, config)
+    return plan_build(
+        path,
+        profile,
+        input_direction_order,
+        config["attack_folder_priority"],
+        attack_extra_folders,
+    )
+
+
+def folder_config_hash(name, profile, config, stitch_mode):
+    input_direction_order, attack_extra_folders = folder_settings(name, profile, config)
+    return config_fingerprint(
+        profile,
+        config["frame_size"],
+        input_direction_order,
+        config["attack_folder_priority"],
+        attack_extra_folders,
+        stitch_mode,
+    )
+
+
+def output_path_for(name, path):
+    return os.path.join(path, f"{validate_output_base(output_name_for_folder(name), name)}.png")
+
+
+def stitch_folder(name, path, profile, config, magick_cmds, stitch_mode, output_path):
+    input_direction_order, attack_extra_folders = folder_settings(name, profile, config)
+    build_sprite_sheet(
+        magick_cmds,
+        path,
+        output_path,
+        profile,
+        config["frame_size"],
+        input_direction_order,
+        config["attack_folder_priority"],
+        attack_extra_folders,
+        timeout_seconds=300,
+        stitch_mode=stitch_mode,
+    )
+
+
+def available_stitch_modes(magick_cmds):
+    modes = {}
+    for mode in STITCH_MODES:
+        if mode in ("native", "stream"):
+            modes[mode] = None if Image is not None else "Pillow not installed"
+        else:
+            modes[mode] = None if magick_cmds else "ImageMagick not found"
+    return modes
+
+
+def prime_outputs(folders, config, magick_cmds, stitch_mode):
+    # Real sheets and manifests, so "check" measures the no-op path a typical run takes.
+    for name, path, _, profile in folders:
+        output_path = output_path_for(name, path)
+        stitch_folder(name, path, profile, config, magick_cmds, stitch_mode, output_path)
+        plan = plan_folder(name, path, profile, config)
+        write_manifest(
+            manifest_path_for(output_path),
+            output_path,
+            fingerprint_inputs(plan),
+            folder_config_hash(name, profile, config, stitch_mode),
+        )
+
+
+def run_phase(phase, folders, config, magick_cmds, primed_mode, scratch_dir):
+    # Returns seconds spent in the measured work only; setup and cleanup are excluded.
+    elapsed = 0.0
+    if phase == "copy":
+        shutil.rmtree(config["game_root"], ignore_errors=True)
+    for name, path, object_type, profile in folders:
+        if phase == "scan":
+            start = time.perf_counter()
+            plan_folder(name, path, profile, config)
+            elapsed += time.perf_counter() - start
+        elif phase in ("check", "check_cold"):
+            output_path = output_path_for(name, path)
+            config_hash = folder_config_hash(name, profile, config, primed_mode)
+            start = time.perf_counter()
+            plan = plan_folder(name, path, profile, config)
+            manifest = load_manifest(manifest_path_for(output_path))
+            previous = manifest.get("inputs") if manifest and phase == "check" else None
+            inputs = fingerprint_inputs(plan, previous)
+            needs_rebuild(output_path, manifest, inputs, config_hash)
+            elapsed += time.perf_counter() - start
+        elif phase == "precheck":
+            plan = plan_folder(name, path, profile, config)
+            unique_frames = sorted({frame for row in plan.rows for frame in row})
+            start = time.perf_counter()
+            precheck_pngs(unique_frames, config["frame_size"])
+            elapsed += time.perf_counter() - start
+        elif phase.startswith("stitch_"):
+            stitch_mode = phase[len("stitch_") :]
+            output_path = os.path.join(scratch_dir, f"{stitch_mode}-{name}.png")
+            start = time.perf_counter()
+            stitch_folder(name, path, profile, config, magick_cmds, stitch_mode, output_path)
+            elapsed += time.perf_counter() - start
+            os.remove(output_path)
+        elif phase in ("copy", "copy_unchanged"):
+            output_path = output_path_for(name, path)
+            start = time.perf_counter()
+            copy_to_targets(output_path, os.path.basename(output_path), object_type, config)
+            elapsed += time.perf_counter() - start
+    return elapsed
+
+
+def check_parity(folders, config, magick_cmds, modes, scratch_dir):
+    # Every other available mode must decode to the same RGBA pixels as montage.
+    others = [mode for mode in STITCH_MODES if mode != "montage" and not modes[mode]]
+    mismatches = []
+    for name, path, _, profile in folders:
+        reference = None
+        for stitch_mode in ("montage", *others):
+            output_path = os.path.join(scratch_dir, f"parity-{stitch_mode}-{name}.png")
+            stitch_folder(name, path, profile, config, magick_cmds, stitch_mode, output_path)
+            with Image.open(output_path) as sheet:
+                pixels = (sheet.size, sheet.convert("RGBA").tobytes())
+            os.remove(output_path)
+            if reference is None:
+                reference = pixels
+            elif pixels != reference:
+                mismatches.append(f"{stitch_mode}:{name}")
+    return others, mismatches
+
+
+def summarize(runs):
+    return {
+        "runs": runs,
+        "min": min(runs),
+        "median": statistics.median(runs),
+        "mean": statistics.fmean(runs),
+        "stdev": statistics.stdev(runs) if len(runs) > 1 else 0.0,
+    }
+
+
+def environment_info(magick_cmds):
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pillow": getattr(sys.modules.get("PIL"), "__version__", None),
+        "magick": magick_cmds["montage"][0] if magick_cmds else None,
+    }
+
+
+def compare_with_baseline(results, baseline, threshold):
+    # Medians are compared; a phase regresses when it is slower than baseline * (1 + threshold).
+    if (
+        baseline.get("version") != results["version"]
+        or baseline.get("params") != results["params"]
+    ):
+        print(
+            "Baseline was recorded with a different version or parameters; comparison skipped.",
+            file=sys.stderr,
+        )
+        return None
+    regressions = []
+    print(f"{'phase':<16}{'baseline':>12}{'current':>12}{'change':>10}")
+    for phase, current in results["phases"].items():
+        recorded = baseline.get("phases", {}).get(phase)
+        if not current.get("runs") or not recorded or not recorded.get("runs"):
+            continue
+        before = recorded["median"]
+        after = current["median"]
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if after > before * (1 + threshold):
+            regressions.append(phase)
+            flag = "  REGRESSION"
+        print(f"{phase:<16}{before:>11.4f}s{after:>11.4f}s{change:>+9.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark build_sprites.py hot paths on a synthetic sprite library."
+    )
+    parser.add_argument("--heroes", type=int, default=1, help="PJ_ folders to generate.")
+    parser.add_argument("--weapons", type=int, default=2, help="W_ folders to generate.")
+    parser.add_argument("--enemies", type=int, default=2, help="E#_ folders to generate.")
+    parser.add_argument("--npcs", type=int, default=1, help="NPC_ folders to generate.")
+    parser.add_argument("--items", type=int, default=1, help="I_ folders to generate.")
+    parser.add_argument(
+        "--frames",
+        type=int,
+        default=None,
+        help="Frames per view for every action (default: each profile's own count).",
+    )
+    parser.add_argument(
+        "--frame-size",
+        type=parse_frame_size,
+        default=DEFAULT_CONFIG["frame_size"],
+        help="Frame size as WxH (default: 128x128).",
+    )
+    parser.add_argument("--seed", type=int, default=1, help="Seed for frame contents.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per phase.")
+    parser.add_argument(
+        "--phases",
+        help=f"Comma-separated subset of phases to run ({', '.join(PHASES)}).",
+    )
+    parser.add_argument(
+        "--library",
+        help="Generate the library here and keep it (default: a temporary folder).",
+    )
+    parser.add_argument(
+        "--output",
+        default="bench_results.json",
+        help="Path to write the JSON results.",
+    )
+    parser.add_argument(
+        "--check-parity",
+        action="store_true",
+        help="Check that append/native/stream sheets match montage pixel for pixel.",
+    )
+    parser.add_argument("--baseline", help="Baseline JSON to compare the results against.")
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Write the results to --baseline instead of comparing.",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Allowed slowdown of a phase median over the baseline (0.25 = 25%%).",
+    )
+    args = parser.parse_args()
+
+    counts = {kind: getattr(args, kind) for kind, _ in LIBRARY_KINDS}
+    if any(count < 0 for count in counts.values()) or not any(counts.values()):
+        print("Error: folder counts must be >= 0 and at least one must be > 0", file=sys.stderr)
+        return 1
+    if args.repeat < 1 or (args.frames is not None and args.frames < 1):
+        print("Error: --repeat and --frames must be >= 1", file=sys.stderr)
+        return 1
+    if args.update_baseline and not args.baseline:
+        print("Error: --update-baseline needs --baseline", file=sys.stderr)
+        return 1
+    phases = list(PHASES)
+    if args.phases:
+        phases = [phase.strip() for phase in args.phases.split(",") if phase.strip()]
+        unknown = [phase for phase in phases if phase not in PHASES]
+        if unknown:
+            print(f"Error: unknown phase(s): {', '.join(unknown)}", file=sys.stderr)
+            return 1
+
+    work_dir = tempfile.mkdtemp(prefix="bench_sprites-")
+    library_root = os.path.abspath(args.library) if args.library else os.path.join(work_dir, "library")
+    scratch_dir = os.path.join(work_dir, "scratch")
+    os.makedirs(library_root, exist_ok=True)
+    os.makedirs(scratch_dir)
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    config["frame_size"] = list(args.frame_size)
+    config["game_root"] = os.path.join(work_dir, "game")
+    if args.frames is not None:
+        overrides = {action: args.frames for action in ("idle", "walk", "attack")}
+        config["profiles"] = {
+            object_type: apply_frames_overrides(profile, overrides)
+            for object_type, profile in config["profiles"].items()
+        }
+
+    magick_cmds = find_magick()
+    modes = available_stitch_modes(magick_cmds)
+    primed_mode = next((mode for mode in ("native", "append", "montage") if not modes[mode]), None)
+    try:
+        start = time.perf_counter()
+        folders = generate_library(library_root, counts, config, args.seed)
+        frame_count = sum(
+            len(plan_folder(name, path, profile, config).input_paths)
+            for name, path, _, profile in folders
+        )
+        print(
+            f"Generated {len(folders)} folder(s), {frame_count} frame(s) "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+        if primed_mode:
+            prime_outputs(folders, config, magick_cmds, primed_mode)
+        parity = None
+        if args.check_parity:
+            reason = modes["montage"] or modes["native"]
+            if reason:
+                print(f"{'parity':<16} skipped: {reason}")
+                parity = {"skipped": reason}
+            else:
+                compared, mismatches = check_parity(
+                    folders, config, magick_cmds, modes, scratch_dir
+                )
+                parity = {"modes": compared, "mismatches": mismatches}
+                status = f"MISMATCH {', '.join(mismatches)}" if mismatches else "identical"
+                print(f"{'parity':<16} {', '.join(compared)} vs montage: {status}")
+
+        results = {
+            "version": BENCH_VERSION,
+            "params": {
+                "counts": counts,
+                "frames": args.frames,
+                "frame_size": list(args.frame_size),
+                "seed": args.seed,
+                "targets": len(config["targets"]),
+            },
+            "environment": environment_info(magick_cmds),
+            "repeat": args.repeat,
+            "phases": {},
+        }
+        if parity is not None:
+            results["parity"] = parity
+        for phase in phases:
+            reason = None
+            if phase.startswith("stitch_"):
+                reason = modes[phase[len("stitch_") :]]
+            elif phase in ("check", "check_cold", "copy", "copy_unchanged") and not primed_mode:
+                reason = "no stitch mode available to build outputs"
+            if reason:
+                print(f"{phase:<16} skipped: {reason}")
+                results["phases"][phase] = {"skipped": reason}
+                continue
+            if phase == "copy_unchanged":
+                run_phase("copy", folders, config, magick_cmds, primed_mode, scratch_dir)
+            runs = [
+                run_phase(phase, folders, config, magick_cmds, primed_mode, scratch_dir)
+                for _ in range(args.repeat)
+            ]
+            summary = summarize(runs)
+            results["phases"][phase] = summary
+            print(
+                f"{phase:<16} median {summary['median']:.4f}s "
+                f"min {summary['min']:.4f}s (n={args.repeat})"
+            )
+    except (RuntimeError, OSError) as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    with open(args.output, "w", encoding="utf-8") as handle:
+        json.dump(results, handle, indent=2)
+    print(f"Wrote {args.output}")
+    if parity and parity.get("mismatches"):
+        print("Stitch modes do not match montage.", file=sys.stderr)
+        return 1
+
+    if not args.baseline:
+        return 0
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+        print(f"Updated baseline {args.baseline}")
+        return 0
+    try:
+        with open(args.baseline, "r", encoding="utf-8") as handle:
+            baseline = json.load(handle)
+    except (OSError, ValueError) as exc:
+        print(f"Error: cannot read baseline {args.baseline}: {exc}", file=sys.stderr)
+        return 1
+    regressions = compare_with_baseline(results, baseline, args.threshold)
+    if regressions is None:
+        return 1
+    if regressions:
+        print(f"Regressions over {args.threshold:.0%}: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    print("No regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
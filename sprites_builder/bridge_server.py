@@ -1,88 +1,180 @@
 #!/usr/bin/env python3
-import base64
+import concurrent.futures
+import fnmatch
 import json
+import logging
+import multiprocessing
 import os
-import subprocess
+import shutil
+import threading
+import time
+import uuid
+from urllib.parse import quote, unquote, urlsplit
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 from build_sprites import (
+    FRAME_CACHE,
+    BuildCancelled,
+    Image,
+    build_folder_captured,
     classify_folder,
+    file_fingerprint,
+    find_magick,
+    list_dirs,
+    load_config,
+    load_manifest,
+    manifest_path_for,
     output_name_for_folder,
+    run_parallel,
     validate_output_base,
-    DEFAULT_CONFIG,
 )
 
 HOST = "127.0.0.1"
 PORT = 8765
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-BUILD_SCRIPT = os.path.join(SCRIPT_DIR, "build_sprites.py")
 CONFIG_PATH = os.path.join(SCRIPT_DIR, "spritesgg.local.config.json")
-FRAME_W, FRAME_H = DEFAULT_CONFIG["frame_size"]
+LOG_PATH = os.path.join(SCRIPT_DIR, "build_sprites.log")
+CONFIG = load_config(CONFIG_PATH)
+FRAME_W, FRAME_H = CONFIG["frame_size"]
+# Decoded frames stay cached across builds for the life of the bridge.
+FRAME_CACHE.resize(CONFIG["frame_cache_mb"] * 1024 * 1024)
+BUILD_OPTIONS = {
+    "magick_cmds": find_magick(),
+    "force_rebuild": False,
+    "dry_run": False,
+    "timeout": 300,
+    "verbose": False,
+    "precheck": True,
+    "stitch": "native" if Image is not None else "append",
+    "json": False,
+    "layout": "grid",
+    "optimize": False,
+    "row_cache": True,
+    # Per-phase timings for /build, /jobs and /build-batch results.
+    "trace": True,
+}
+# One long-lived worker: config and tooling are resolved once and builds run
+# in-process (captured stdout is process-wide, so one build at a time). BUILD_QUEUE
+# caps how many builds may wait for it and coalesces requests for the same folder.
+BUILD_WORKERS = 1
+BUILD_QUEUE_LIMIT = 8
+BUILD_WORKER = concurrent.futures.ThreadPoolExecutor(
+    max_workers=BUILD_WORKERS, thread_name_prefix="builder"
+)
+# output_name -> output_path of every sheet this bridge has built or served.
+SHEETS = {}
+SHEETS_LOCK = threading.Lock()
+# /build-batch fans out to a process pool of at most this many workers.
+BATCH_MAX_JOBS = os.cpu_count() or 1
+# Never fork the threaded server: a child could inherit a lock held by another
+# thread (logging, BUILD_QUEUE, JOBS) and deadlock.
+BATCH_MP_CONTEXT = multiprocessing.get_context("forkserver")
+BATCH_MAX_FOLDERS = 500
+BATCH_LIMIT = 1
+JOB_RETENTION_SECONDS = 15 * 60
+JOBS = {}
+JOBS_LOCK = threading.Lock()
+
+
+def send_cors_headers(handler):
+    handler.send_header("Access-Control-Allow-Origin", "*")
+    handler.send_header("Access-Control-Allow-Methods", "GET,POST,DELETE,OPTIONS")
+    handler.send_header("Access-Control-Allow-Headers", "Content-Type, Last-Event-ID")
 
 
-def json_response(handler, status, payload):
+def json_response(handler, status, payload, headers=None):
     body = json.dumps(payload).encode("utf-8")
     handler.send_response(status)
     handler.send_header("Content-Type", "application/json; charset=utf-8")
     handler.send_header("Content-Length", str(len(body)))
-    handler.send_header("Access-Control-Allow-Origin", "*")
-    handler.send_header("Access-Control-Allow-Methods", "GET,POST,OPTIONS")
-    handler.send_header("Access-Control-Allow-Headers", "Content-Type")
+    for name, value in (headers or {}).items():
+        handler.send_header(name, value)
+    send_cors_headers(handler)
     handler.end_headers()
     handler.wfile.write(body)
 
 
+def sheet_etag(output_path):
+    # The build manifest already holds the sheet hash; only re-hash if the file moved on.
+    manifest = load_manifest(manifest_path_for(output_path)) or {}
+    fingerprint = file_fingerprint(output_path, manifest.get("output"))
+    return f'"{fingerprint["sha256"]}"'
+
+
+def sheet_response(handler, output_name):
+    with SHEETS_LOCK:
+        output_path = SHEETS.get(output_name)
+    if not output_path or not os.path.isfile(output_path):
+        return json_response(handler, 404, {"success": False, "error": "Sheet not found"})
+    etag = sheet_etag(output_path)
+    if etag in [tag.strip() for tag in handler.headers.get("If-None-Match", "").split(",")]:
+        handler.send_response(304)
+        handler.send_header("ETag", etag)
+        handler.send_header("Cache-Control", "no-cache")
+        send_cors_headers(handler)
+        handler.end_headers()
+        return None
+    with open(output_path, "rb") as handle:
+        size = os.fstat(handle.fileno()).st_size
+        handler.send_response(200)
+        handler.send_header("Content-Type", "image/png")
+        handler.send_header("Content-Length", str(size))
+        handler.send_header("ETag", etag)
+        handler.send_header("Cache-Control", "no-cache")
+        send_cors_headers(handler)
+        handler.end_headers()
+        shutil.copyfileobj(handle, handler.wfile, 64 * 1024)
+    return None
+
+
+def sheet_url(output_name, etag):
+    version = etag.strip('"')[:16]
+    return f"/sheets/{quote(output_name)}?v={version}"
+
+
 def output_name_for_path(folder_name):
     base = output_name_for_folder(folder_name)
     base = validate_output_base(base, folder_name)
     return f"{base}.png"
 
 
-def run_builder(folder_path):
+def prepare_build(folder_path, progress=None):
     folder_path = os.path.abspath(folder_path)
     if not os.path.isdir(folder_path):
         raise RuntimeError(f"Carpeta no existe: {folder_path}")
 
     folder_name = os.path.basename(folder_path.rstrip(os.sep))
-    object_type = classify_folder(folder_name, {})
+    object_type = classify_folder(folder_name, CONFIG.get("type_overrides", {}))
     if not object_type:
         raise RuntimeError("Prefijo inválido. Usa PJ_, W_, NPC_, I_ o E#_.")
 
     cwd = os.path.dirname(folder_path)
     output_name = output_name_for_path(folder_name)
-    output_path = os.path.join(folder_path, output_name)
 
-    cmd = [
-        "python3",
-        BUILD_SCRIPT,
-        "--config",
-        CONFIG_PATH,
-        "--only",
-        folder_name,
-        "--rebuild-all",
-        "--precheck",
-        "--stitch",
-        "append",
-    ]
-
-    proc = subprocess.run(
-        cmd,
-        cwd=cwd,
-        capture_output=True,
-        text=True,
-    )
+    config = dict(CONFIG)
+    # Same as running build_sprites.py from the folder's parent directory.
+    config["game_root"] = os.path.join(cwd, CONFIG["game_root"])
+    options = dict(BUILD_OPTIONS, config=config, progress=progress)
+    profile = config["profiles"].get(object_type)
+    if not profile:
+        raise RuntimeError(f"Sin perfil para el tipo '{object_type}'")
+    return (folder_name, folder_path, object_type, profile, options, 1, 1), output_name
 
-    if proc.returncode != 0:
-        stderr = (proc.stderr or "").strip()
-        stdout = (proc.stdout or "").strip()
-        detail = stderr or stdout or "build_sprites failed"
+
+def build_result(task, output_name, status, stdout, stderr, elapsed_ms, stats=None):
+    folder_name, folder_path, object_type = task[:3]
+    output_path = os.path.join(folder_path, output_name)
+    if status == "error":
+        detail = stderr.strip() or stdout.strip() or "build_sprites failed"
         raise RuntimeError(detail)
 
     if not os.path.isfile(output_path):
         raise RuntimeError(f"No se encontró el output esperado: {output_path}")
 
-    with open(output_path, "rb") as f:
-        encoded = base64.b64encode(f.read()).decode("ascii")
+    with SHEETS_LOCK:
+        SHEETS[output_name] = output_path
+    etag = sheet_etag(output_path)
+    timings = ((stats or {}).get("folder_timings") or [{}])[0]
 
     return {
         "success": True,
@@ -92,10 +184,503 @@ def run_builder(folder_path):
         "output_path": output_path,
         "frame_width": FRAME_W,
         "frame_height": FRAME_H,
-        "stdout_tail": (proc.stdout or "").strip().splitlines()[-1] if proc.stdout else "",
-        "stderr_tail": (proc.stderr or "").strip().splitlines()[-1] if proc.stderr else "",
-        "png_base64": encoded,
+        "cached": status == "skipped",
+        "elapsed_ms": elapsed_ms,
+        "timings_ms": {name: int(ms) for name, ms in timings.get("phases_ms", {}).items()},
+        "stdout_tail": stdout.strip().splitlines()[-1] if stdout.strip() else "",
+        "stderr_tail": stderr.strip().splitlines()[-1] if stderr.strip() else "",
+        "etag": etag,
+        "size_bytes": os.path.getsize(output_path),
+        "sheet_url": sheet_url(output_name, etag),
+    }
+
+
+class QueueFull(RuntimeError):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class BuildEntry:
+    # One build of one folder. Every request for that folder while it is queued or
+    # running attaches here and shares its future instead of starting another build.
+    def __init__(self, folder_path, lock):
+        self.folder_path = folder_path
+        self.lock = lock
+        self.future = None
+        self.started = None
+        # Progress callbacks of attached jobs; None stands for a plain waiter.
+        self.listeners = []
+
+    def progress(self, phase, **info):
+        alive = 0
+        for listener in list(self.listeners):
+            if listener is None:
+                alive += 1
+                continue
+            try:
+                listener(phase, **info)
+                alive += 1
+            except BuildCancelled:
+                self.detach(listener)
+        # Only abort once nobody is left waiting for the sheet.
+        if not alive:
+            raise BuildCancelled("Build cancelled")
+
+    def detach(self, listener):
+        with self.lock:
+            if listener in self.listeners:
+                self.listeners.remove(listener)
+            orphaned = not self.listeners
+        if orphaned and self.future is not None:
+            self.future.cancel()
+
+
+class BuildQueue:
+    # Admission control for single-folder builds: a bounded executor, at most
+    # `limit` builds waiting for it, and same-folder requests coalesced. Batches
+    # claim their folders here too, so a batch and a /build never race on one output.
+    def __init__(self, executor, workers, limit, batch_limit):
+        self.executor = executor
+        self.workers = workers
+        self.limit = limit
+        self.batch_limit = batch_limit
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.batches = 0
+        self.average_seconds = 1.0
+
+    def retry_after(self, waiting):
+        # Seconds until roughly one slot frees up, from the recent build durations.
+        return max(1, int(self.average_seconds * max(1, waiting) / self.workers + 0.5))
+
+    def queued(self):
+        return sum(1 for entry in self.entries.values() if entry.started is None)
+
+    def submit(self, folder_path, listener=None):
+        folder_path = os.path.abspath(folder_path)
+        entry = BuildEntry(folder_path, self.lock)
+        task, output_name = prepare_build(folder_path, progress=entry.progress)
+        with self.lock:
+            current = self.entries.get(folder_path)
+            if current is not None and not current.future.cancelled():
+                current.listeners.append(listener)
+                return current
+            waiting = self.queued()
+            if waiting >= self.limit:
+                retry_after = self.retry_after(waiting)
+                raise QueueFull(
+                    f"Cola de builds llena ({waiting}), reintenta en {retry_after}s",
+                    retry_after,
+                )
+            entry.listeners.append(listener)
+            self.entries[folder_path] = entry
+            entry.future = self.executor.submit(self.run, entry, task, output_name)
+        entry.future.add_done_callback(lambda _: self.release(entry))
+        return entry
+
+    def run(self, entry, task, output_name):
+        entry.started = time.time()
+        if not entry.listeners:
+            raise BuildCancelled("Build cancelled")
+        _, status, stdout, stderr, stats = build_folder_captured(task)
+        elapsed = time.time() - entry.started
+        self.record(elapsed)
+        return build_result(task, output_name, status, stdout, stderr, int(elapsed * 1000), stats)
+
+    def record(self, seconds):
+        with self.lock:
+            self.average_seconds = 0.8 * self.average_seconds + 0.2 * seconds
+
+    def release(self, entry):
+        with self.lock:
+            if self.entries.get(entry.folder_path) is entry:
+                del self.entries[entry.folder_path]
+
+    def claim_batch(self, folder_paths):
+        # Returns folder_path -> (entry, owned). Owned entries are resolved by the
+        # batch; folders already building elsewhere are awaited instead.
+        with self.lock:
+            if self.batches >= self.batch_limit:
+                retry_after = self.retry_after(len(self.entries))
+                raise QueueFull(
+                    f"Ya hay un batch en curso, reintenta en {retry_after}s", retry_after
+                )
+            self.batches += 1
+            claims = {}
+            for folder_path in folder_paths:
+                current = self.entries.get(folder_path)
+                if current is not None and not current.future.cancelled():
+                    current.listeners.append(None)
+                    claims[folder_path] = (current, False)
+                    continue
+                entry = BuildEntry(folder_path, self.lock)
+                entry.listeners.append(None)
+                entry.started = time.time()
+                entry.future = concurrent.futures.Future()
+                entry.future.set_running_or_notify_cancel()
+                self.entries[folder_path] = entry
+                claims[folder_path] = (entry, True)
+        for entry, owned in claims.values():
+            if owned:
+                entry.future.add_done_callback(lambda _, entry=entry: self.release(entry))
+        return claims
+
+    def end_batch(self):
+        with self.lock:
+            self.batches -= 1
+
+    def stats(self):
+        with self.lock:
+            queued = self.queued()
+            return {
+                "queued": queued,
+                "in_flight": len(self.entries) - queued,
+                "limit": self.limit,
+                "workers": self.workers,
+                "batches": self.batches,
+                "average_build_ms": int(self.average_seconds * 1000),
+            }
+
+
+BUILD_QUEUE = BuildQueue(BUILD_WORKER, BUILD_WORKERS, BUILD_QUEUE_LIMIT, BATCH_LIMIT)
+
+
+def run_builder(folder_path):
+    return BUILD_QUEUE.submit(folder_path).future.result()
+
+
+def batch_folders(payload):
+
+    # Either an explicit folder list, or every folder under root that passes the
+    # type and glob filters (items only when asked for, like the CLI).
+    folders = payload.get("folders")
+    if folders is not None:
+        if not isinstance(folders, list) or not all(isinstance(item, str) for item in folders):
+            raise RuntimeError("folders debe ser una lista de rutas")
+        paths = [item.strip() for item in folders if item.strip()]
+    else:
+        root = (payload.get("root") or "").strip()
+        if not root:
+            raise RuntimeError("Falta folders o root")
+        root = os.path.abspath(root)
+        if not os.path.isdir(root):
+            raise RuntimeError(f"Carpeta no existe: {root}")
+        types = payload.get("types") or []
+        if isinstance(types, str):
+            types = [types]
+        unknown = [item for item in types if item not in CONFIG["profiles"]]
+        if unknown:
+            raise RuntimeError(f"Tipo(s) desconocido(s): {', '.join(map(str, unknown))}")
+        pattern = (payload.get("glob") or "").strip().lower()
+        paths = []
+        for name, path in sorted(list_dirs(root)):
+            if name.startswith("."):
+                continue
+            if pattern and not fnmatch.fnmatchcase(name.lower(), pattern):
+                continue
+            object_type = classify_folder(name, CONFIG.get("type_overrides", {}))
+            if not object_type or object_type not in CONFIG["profiles"]:
+                continue
+            if types and object_type not in types:
+                continue
+            if not types and object_type == "item":
+                continue
+            paths.append(path)
+    if not paths:
+        raise RuntimeError("Ninguna carpeta coincide con el filtro")
+    if len(paths) > BATCH_MAX_FOLDERS:
+        raise RuntimeError(f"Máximo {BATCH_MAX_FOLDERS} carpetas por batch")
+    return list(dict.fromkeys(os.path.abspath(path) for path in paths))
+
+
+def batch_line(folder_path, future):
+    line = {
+        "folder_path": folder_path,
+        "folder_name": os.path.basename(folder_path.rstrip(os.sep)),
     }
+    try:
+        result = future.result()
+    except Exception as exc:
+        line.update(status="error", elapsed_ms=0, timings_ms={}, success=False, error=str(exc))
+        return line
+    line.update(
+        status="skipped" if result["cached"] else "built",
+        elapsed_ms=result["elapsed_ms"],
+        timings_ms=result["timings_ms"],
+        success=True,
+    )
+    for key in ("object_type", "output_name", "cached", "etag", "size_bytes", "sheet_url"):
+        line[key] = result[key]
+    return line
+
+
+def start_batch(folder_paths, jobs):
+    # Returns folder_path -> future. Folders that fail validation get a failed
+    # future right away; the rest are claimed in BUILD_QUEUE (raising QueueFull
+    # before anything starts) and built by a background driver thread.
+    futures = {}
+    prepared = {}
+    names = set()
+    for folder_path in folder_paths:
+        try:
+            task, output_name = prepare_build(folder_path)
+            if task[0] in names:
+                raise RuntimeError(f"Carpeta duplicada en el batch: {task[0]}")
+        except Exception as exc:
+            futures[folder_path] = concurrent.futures.Future()
+            futures[folder_path].set_exception(exc)
+            continue
+        names.add(task[0])
+        prepared[folder_path] = (task, output_name)
+    claims = BUILD_QUEUE.claim_batch(list(prepared))
+    owned = {}
+    for folder_path, (entry, is_owner) in claims.items():
+        futures[folder_path] = entry.future
+        if is_owner:
+            task, output_name = prepared[folder_path]
+            owned[task[0]] = (entry, task, output_name)
+    threading.Thread(
+        target=drive_batch, args=(owned, jobs), name="batch", daemon=True
+    ).start()
+    return futures
+
+
+def drive_batch(owned, jobs):
+    # Builds the owned folders in a bounded process pool, or on the long-lived
+    # worker when there is nothing to parallelize, resolving each entry's future.
+    tasks = [task for _, task, _ in owned.values()]
+    try:
+        if jobs > 1 and len(tasks) > 1:
+            # Batch workers exit with the batch, so they decode without a frame
+            # cache; only the long-lived worker keeps FRAME_CACHE warm.
+            results = run_parallel(
+                tasks,
+                min(jobs, len(tasks)),
+                LOG_PATH,
+                0,
+                mp_context=BATCH_MP_CONTEXT,
+            )
+        else:
+            results = (
+                BUILD_WORKER.submit(build_folder_captured, task).result() for task in tasks
+            )
+        for name, status, stdout, stderr, stats in results:
+            entry, task, output_name = owned[name]
+            timings = (stats.get("folder_timings") or [{}])[0]
+            elapsed_ms = int(timings.get("total_ms", 0))
+            try:
+                result = build_result(task, output_name, status, stdout, stderr, elapsed_ms, stats)
+            except Exception as exc:
+                entry.future.set_exception(exc)
+            else:
+                entry.future.set_result(result)
+    except Exception as exc:
+        logging.exception("Batch build failed")
+        for entry, _, _ in owned.values():
+            if not entry.future.done():
+                entry.future.set_exception(RuntimeError(f"Batch falló: {exc}"))
+    finally:
+        for entry, _, _ in owned.values():
+            if not entry.future.done():
+                entry.future.set_exception(RuntimeError("Build sin resultado"))
+        BUILD_QUEUE.end_batch()
+
+
+def stream_batch(handler, futures):
+    handler.send_response(200)
+    handler.send_header("Content-Type", "application/x-ndjson")
+    handler.send_header("Cache-Control", "no-cache")
+    send_cors_headers(handler)
+    handler.end_headers()
+    start_time = time.time()
+    counts = {"built": 0, "skipped": 0, "error": 0}
+    folders = {future: folder_path for folder_path, future in futures.items()}
+    try:
+        # Builds keep going if the client disconnects; only the stream stops.
+        for future in concurrent.futures.as_completed(folders):
+            line = batch_line(folders[future], future)
+            counts[line["status"]] += 1
+            handler.wfile.write(json.dumps(line).encode("utf-8") + b"\n")
+            handler.wfile.flush()
+        summary = {
+            "done": True,
+            "total": len(futures),
+            "built": counts["built"],
+            "skipped": counts["skipped"],
+            "errors": counts["error"],
+            "elapsed_ms": int((time.time() - start_time) * 1000),
+        }
+        handler.wfile.write(json.dumps(summary).encode("utf-8") + b"\n")
+    except (BrokenPipeError, ConnectionResetError):
+        pass
+
+
+class Job:
+    def __init__(self, folder_path):
+        self.id = uuid.uuid4().hex
+        self.folder_path = folder_path
+        self.status = "queued"
+        self.created = time.time()
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.events = []
+        self.timings = {}
+        self.phase = None
+        self.phase_started = None
+        self.entry = None
+        self.cancel_requested = threading.Event()
+        self.changed = threading.Condition()
+
+    def emit(self, phase, final=False, **info):
+        now = time.time()
+        with self.changed:
+            if phase != self.phase:
+                if self.phase is not None:
+                    spent = int((now - self.phase_started) * 1000)
+                    self.timings[self.phase] = self.timings.get(self.phase, 0) + spent
+                self.phase = phase
+                self.phase_started = now
+            event = dict(info, phase=phase, elapsed_ms=int((now - self.created) * 1000))
+            if final:
+                event["timings_ms"] = dict(self.timings)
+            self.events.append(event)
+            self.changed.notify_all()
+
+    def progress(self, phase, **info):
+        # Called from the build worker between steps; raising here aborts the build.
+        if self.cancel_requested.is_set():
+            raise BuildCancelled("Build cancelled")
+        if self.status == "queued":
+            self.status = "running"
+        self.emit(phase, **info)
+
+    def finish(self, status, result=None, error=None):
+        with self.changed:
+            # A cancel and the build settling can race; the first one wins.
+            if self.done:
+                return
+            self.status = status
+            self.result = result
+            self.error = error
+            payload = {}
+            if result is not None:
+                payload["result"] = result
+            if error is not None:
+                payload["error"] = error
+            self.emit(status, final=True, **payload)
+            self.finished = time.time()
+
+    def attach(self, entry):
+        self.entry = entry
+        entry.future.add_done_callback(self.settle)
+
+    def settle(self, future):
+        if future.cancelled() or self.cancel_requested.is_set():
+            self.finish("cancelled", error="Build cancelled")
+        elif future.exception() is not None:
+            self.finish("error", error=str(future.exception()))
+        else:
+            self.finish("done", result=future.result())
+
+    def cancel(self):
+        # Detaching only aborts the shared build when no other request still waits on it.
+        self.cancel_requested.set()
+        self.entry.detach(self.progress)
+        self.finish("cancelled", error="Build cancelled")
+
+    def snapshot(self):
+        with self.changed:
+            return {
+                "success": True,
+                "job_id": self.id,
+                "folder_path": self.folder_path,
+                "status": self.status,
+                "phase": self.phase,
+                "created": self.created,
+                "finished": self.finished,
+                "timings_ms": dict(self.timings),
+                "last_event": self.events[-1] if self.events else None,
+                "result": self.result,
+                "error": self.error,
+                "events_url": f"/jobs/{self.id}/events",
+            }
+
+    @property
+    def done(self):
+        return self.finished is not None
+
+
+def prune_jobs():
+    cutoff = time.time() - JOB_RETENTION_SECONDS
+    with JOBS_LOCK:
+        for job_id in [key for key, job in JOBS.items() if job.done and job.finished < cutoff]:
+            del JOBS[job_id]
+
+
+def start_job(folder_path):
+    prune_jobs()
+    job = Job(folder_path)
+    job.attach(BUILD_QUEUE.submit(folder_path, listener=job.progress))
+    # Published only once attached, so a DELETE /jobs/<id> always finds its entry.
+    with JOBS_LOCK:
+        JOBS[job.id] = job
+    return job
+
+
+def get_job(job_id):
+    prune_jobs()
+    with JOBS_LOCK:
+        return JOBS.get(job_id)
+
+
+def stream_job_events(handler, job):
+    handler.send_response(200)
+    handler.send_header("Content-Type", "text/event-stream")
+    handler.send_header("Cache-Control", "no-cache")
+    send_cors_headers(handler)
+    handler.end_headers()
+    try:
+        sent = int(handler.headers.get("Last-Event-ID", "-1")) + 1
+    except ValueError:
+        sent = 0
+    while True:
+        with job.changed:
+            while sent >= len(job.events) and not job.done:
+                job.changed.wait(timeout=15)
+                if sent >= len(job.events) and not job.done:
+                    break
+            pending = job.events[sent:]
+            finished = job.done
+        try:
+            if not pending and not finished:
+                handler.wfile.write(b": keep-alive\n\n")
+            for event in pending:
+                handler.wfile.write(
+                    f"id: {sent}\ndata: {json.dumps(event)}\n\n".encode("utf-8")
+                )
+                sent += 1
+            handler.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            return
+        if finished and sent >= len(job.events):
+            return
+
+
+def queue_full_response(handler, exc):
+    return json_response(
+        handler,
+        429,
+        {"success": False, "error": str(exc), "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+def read_json_body(handler):
+    content_len = int(handler.headers.get("Content-Length", "0"))
+    body = handler.rfile.read(content_len) if content_len > 0 else b"{}"
+    return json.loads(body.decode("utf-8"))
 
 
 class Handler(BaseHTTPRequestHandler):
@@ -103,24 +688,80 @@ class Handler(BaseHTTPRequestHandler):
         json_response(self, 200, {"ok": True})
 
     def do_GET(self):
-        if self.path == "/health":
-            return json_response(self, 200, {"status": "ok"})
+        path = urlsplit(self.path).path
+        if path == "/health":
+            return json_response(
+                self,
+                200,
+                {
+                    "status": "ok",
+                    "frame_cache": FRAME_CACHE.stats(),
+                    "builds": BUILD_QUEUE.stats(),
+                },
+            )
+        if path.startswith("/sheets/"):
+            return sheet_response(self, unquote(path[len("/sheets/") :]))
+        if path.startswith("/jobs/"):
+            parts = path[len("/jobs/") :].split("/")
+            job = get_job(parts[0])
+            if not job:
+                return json_response(self, 404, {"success": False, "error": "Job not found"})
+            if len(parts) == 1:
+                return json_response(self, 200, job.snapshot())
+            if parts[1:] == ["events"]:
+                return stream_job_events(self, job)
         return json_response(self, 404, {"success": False, "error": "Not found"})
 
+    def do_DELETE(self):
+        path = urlsplit(self.path).path
+        if not path.startswith("/jobs/"):
+            return json_response(self, 404, {"success": False, "error": "Not found"})
+        job = get_job(path[len("/jobs/") :])
+        if not job:
+            return json_response(self, 404, {"success": False, "error": "Job not found"})
+        job.cancel()
+        return json_response(self, 202, job.snapshot())
+
     def do_POST(self):
-        if self.path != "/build":
+        path = urlsplit(self.path).path
+        if path == "/jobs":
+            try:
+                payload = read_json_body(self)
+                folder_path = (payload.get("folder_path") or "").strip()
+                if not folder_path:
+                    raise RuntimeError("Falta folder_path")
+                job = start_job(folder_path)
+                return json_response(self, 202, job.snapshot())
+            except QueueFull as exc:
+                return queue_full_response(self, exc)
+            except Exception as exc:
+                return json_response(self, 400, {"success": False, "error": str(exc)})
+        if path == "/build-batch":
+            try:
+                payload = read_json_body(self)
+                folder_paths = batch_folders(payload)
+                jobs = int(payload.get("jobs") or BATCH_MAX_JOBS)
+                if jobs < 1:
+                    raise RuntimeError("jobs debe ser >= 1")
+                futures = start_batch(folder_paths, min(jobs, BATCH_MAX_JOBS))
+            except QueueFull as exc:
+                return queue_full_response(self, exc)
+            except Exception as exc:
+                return json_response(self, 400, {"success": False, "error": str(exc)})
+            return stream_batch(self, futures)
+        if path != "/build":
             return json_response(self, 404, {"success": False, "error": "Not found"})
 
         try:
-            content_len = int(self.headers.get("Content-Length", "0"))
-            body = self.rfile.read(content_len) if content_len > 0 else b"{}"
-            payload = json.loads(body.decode("utf-8"))
+            payload = read_json_body(self)
             folder_path = (payload.get("folder_path") or "").strip()
             if not folder_path:
                 raise RuntimeError("Falta folder_path")
 
             result = run_builder(folder_path)
             return json_response(self, 200, result)
+        except QueueFull as exc:
+            return queue_full_response(self, exc)
         except Exception as exc:
             return json_response(self, 400, {"success": False, "error": str(exc)})
 
@@ -129,6 +770,11 @@ class Handler(BaseHTTPRequestHandler):
 
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        filename=LOG_PATH,
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
     server = ThreadingHTTPServer((HOST, PORT), Handler)
     print(f"Builder bridge running on http://{HOST}:{PORT}")
     try:
@@ -1,16 +1,39 @@
 #!/usr/bin/env python3
 import argparse
+import collections
+import concurrent.futures
+import contextlib
+import ctypes
+import ctypes.util
+import fcntl
+import dataclasses
+import hashlib
+import io
 import json
+import mmap
 import os
+import queue
 import re
+import select
 import shutil
+import socket
+import struct
 import subprocess
 import sys
 import tempfile
+import threading
 import time
+import urllib.request
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 import logging
 
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
 
 DEFAULT_CONFIG = {
     "frame_size": [128, 128],
@@ -46,6 +69,7 @@ DEFAULT_CONFIG = {
         },
     },
     "type_overrides": {},
+    "frame_cache_mb": 256,
     "game_root": "/Users/jesussilva/Documents/gpt/gableguardians",
     "targets": [
         "frontend-web/assets/images",
@@ -116,18 +140,92 @@ def parse_frames_per_view_overrides(values):
     return overrides
 
 
-def precheck_pngs(magick_cmds, files, timeout_seconds=None):
-    identify_cmd = magick_cmds.get("identify")
-    if not identify_cmd:
-        raise RuntimeError("ImageMagick identify is required for precheck")
-    for path in files:
-        subprocess.run(
-            identify_cmd + ["-quiet", "-ping", path],
-            check=True,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            timeout=timeout_seconds,
-        )
+def parse_frame_size(value):
+    try:
+        width, height = (int(part) for part in value.lower().split("x", 1))
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(
+            f"Invalid frame size '{value}', expected WxH"
+        ) from exc
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError(f"Invalid frame size '{value}', must be > 0")
+    return [width, height]
+
+
+def parse_shard(value):
+    try:
+        index, count = (int(part) for part in value.split("/", 1))
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"Invalid shard '{value}', expected i/N") from exc
+    if count < 1 or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"Invalid shard '{value}', need 1 <= i <= N")
+    return index, count
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_CHUNK_HEADER = struct.Struct(">I4s")
+
+
+def png_chunk(chunk_type, data):
+    return (
+        PNG_CHUNK_HEADER.pack(len(data), chunk_type)
+        + data
+        + struct.pack(">I", zlib.crc32(chunk_type + data))
+    )
+
+
+def check_png(path, frame_size):
+    # Reads the signature, IHDR and IEND only; IDAT and other chunks are skipped over.
+    width, height = frame_size
+    try:
+        with open(path, "rb") as handle:
+            if handle.read(8) != PNG_SIGNATURE:
+                return "not a PNG (bad signature)"
+            file_size = os.fstat(handle.fileno()).st_size
+            first = True
+            while True:
+                header = handle.read(PNG_CHUNK_HEADER.size)
+                if len(header) < PNG_CHUNK_HEADER.size:
+                    return "truncated (missing IEND)"
+                length, chunk_type = PNG_CHUNK_HEADER.unpack(header)
+                if first and chunk_type != b"IHDR":
+                    return "first chunk is not IHDR"
+                first = False
+                if chunk_type not in (b"IHDR", b"IEND"):
+                    if handle.tell() + length + 4 > file_size:
+                        return f"truncated inside {chunk_type.decode('latin-1')} chunk"
+                    handle.seek(length + 4, os.SEEK_CUR)
+                    continue
+                data = handle.read(length)
+                crc = handle.read(4)
+                if len(data) < length or len(crc) < 4:
+                    return f"truncated inside {chunk_type.decode('latin-1')} chunk"
+                if zlib.crc32(chunk_type + data) != struct.unpack(">I", crc)[0]:
+                    return f"bad {chunk_type.decode('latin-1')} CRC"
+                if chunk_type == b"IEND":
+                    return None
+                if length != 13:
+                    return "invalid IHDR length"
+                frame_w, frame_h = struct.unpack(">II", data[:8])
+                if (frame_w, frame_h) != (width, height):
+                    return f"size {frame_w}x{frame_h}, expected {width}x{height}"
+    except OSError as exc:
+        return str(exc)
+
+
+def precheck_pngs(files, frame_size, jobs=None):
+    if not files:
+        return
+    workers = jobs or min(32, len(files))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        problems = [
+            (path, problem)
+            for path, problem in zip(files, pool.map(lambda path: check_png(path, frame_size), files))
+            if problem
+        ]
+    if problems:
+        details = "\n".join(f"  {path}: {problem}" for path, problem in problems)
+        raise RuntimeError(f"Precheck failed for {len(problems)} file(s):\n{details}")
 
 
 def list_dirs(root):
@@ -136,14 +234,6 @@ def list_dirs(root):
             yield entry.name, entry.path
 
 
-def list_pngs(folder):
-    files = []
-    for entry in os.scandir(folder):
-        if entry.is_file() and entry.name.lower().endswith(".png"):
-            files.append(entry.name)
-    return sorted(files)
-
-
 def find_folder_case_insensitive(subdirs, target):
     for name in subdirs:
         if name.lower() == target.lower():
@@ -231,19 +321,821 @@ def validate_output_base(name, folder_name):
     return lowered
 
 
-def build_sprite_sheet(
-    magick_cmds,
-    object_dir,
+class BuildCancelled(RuntimeError):
+    pass
+
+
+def report_progress(progress, phase, **info):
+    if progress is not None:
+        progress(phase, **info)
+
+
+class BuildTrace:
+    # Chrome trace-event ("X" complete events) spans for one folder build.
+    def __init__(self, folder):
+        self.folder = folder
+        self.events = []
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    @contextlib.contextmanager
+    def span(self, name, category, **args):
+        start = time.time()
+        try:
+            yield args
+        finally:
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": start * 1e6,
+                "dur": (time.time() - start) * 1e6,
+                "pid": os.getpid(),
+                "tid": threading.get_native_id(),
+                "args": dict(args, folder=self.folder),
+            }
+            with self.lock:
+                self.events.append(event)
+
+    def summary(self):
+        phases = {}
+        for event in self.events:
+            if event["cat"] == "phase":
+                phases[event["name"]] = phases.get(event["name"], 0.0) + event["dur"] / 1000
+        return {
+            "folder": self.folder,
+            "total_ms": round((time.time() - self.started) * 1000, 3),
+            "phases_ms": {name: round(ms, 3) for name, ms in phases.items()},
+            "rows": sum(1 for event in self.events if event["cat"] == "row"),
+            "copies": sum(1 for event in self.events if event["cat"] == "copy"),
+        }
+
+    def close(self, stats):
+        summary = self.summary()
+        self.events.append(
+            {
+                "name": self.folder,
+                "cat": "folder",
+                "ph": "X",
+                "ts": self.started * 1e6,
+                "dur": summary["total_ms"] * 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_native_id(),
+                "args": {"folder": self.folder},
+            }
+        )
+        logging.info(
+            "Timing %s: %.0fms (%s)",
+            self.folder,
+            summary["total_ms"],
+            ", ".join(f"{name} {ms:.0f}ms" for name, ms in summary["phases_ms"].items()),
+        )
+        if stats is not None:
+            add_stats(stats, {"trace_events": self.events, "folder_timings": [summary]})
+
+
+def trace_span(trace, name, category="phase", **args):
+    if trace is None:
+        return contextlib.nullcontext(args)
+    return trace.span(name, category, **args)
+
+
+def write_trace(path, events, folder_timings):
+    origin = min((event["ts"] for event in events), default=0)
+    trace_events = [
+        {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": f"builder {pid}"}}
+        for pid in sorted({event["pid"] for event in events})
+    ]
+    trace_events.extend(
+        dict(event, ts=round(event["ts"] - origin, 3), dur=round(event["dur"], 3))
+        for event in sorted(events, key=lambda event: event["ts"])
+    )
+    payload = {
+        "traceEvents": trace_events,
+        "displayTimeUnit": "ms",
+        "folders": folder_timings,
+    }
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(payload, handle, indent=1)
+
+
+class FrameCache:
+    # Decoded RGBA frames, LRU within a byte budget. An entry is only reused while the
+    # file's size and mtime are unchanged. Cached images are shared: never modify them.
+    def __init__(self, budget_bytes):
+        self.budget = budget_bytes
+        self.entries = collections.OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, path, stat):
+        if self.budget <= 0:
+            return None
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry[0] == (stat.st_size, stat.st_mtime_ns):
+                self.entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, path, stat, image):
+        cost = image.width * image.height * 4
+        with self.lock:
+            previous = self.entries.pop(path, None)
+            if previous is not None:
+                self.bytes -= previous[2]
+            if cost > self.budget:
+                return
+            self.entries[path] = ((stat.st_size, stat.st_mtime_ns), image, cost)
+            self.bytes += cost
+            self.evict()
+
+    def evict(self):
+        while self.bytes > self.budget and self.entries:
+            _, (_, _, cost) = self.entries.popitem(last=False)
+            self.bytes -= cost
+            self.evictions += 1
+
+    def resize(self, budget_bytes):
+        with self.lock:
+            self.budget = budget_bytes
+            self.evict()
+
+    def counters(self):
+        with self.lock:
+            return self.hits, self.misses
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "budget_bytes": self.budget,
+            }
+
+
+# One cache per process, off until a long-lived process sizes it: the bridge and
+# watch mode keep it warm between builds, one-shot runs would only pay its memory.
+FRAME_CACHE = FrameCache(0)
+
+
+# Bumped when the Pillow paths change the pixels they write, so their sheets and
+# row strips rebuild instead of being reused.
+PILLOW_PIXELS_VERSION = 2
+
+
+def clear_transparent(rgba):
+    # montage composites frames Over a "none" background, which stores fully
+    # transparent pixels as (0,0,0,0); paste would keep the colour under alpha 0.
+    alpha = rgba.getchannel("A")
+    if alpha.getextrema()[0] > 0:
+        return rgba
+    cleared = Image.new("RGBA", rgba.size, (0, 0, 0, 0))
+    cleared.paste(rgba, mask=alpha.point(lambda value: 255 if value else 0))
+    return cleared
+
+
+def open_frame_rgba(frame_path, frame_size, keep=True):
+    width, height = frame_size
+    try:
+        stat = os.stat(frame_path)
+        cached = FRAME_CACHE.get(frame_path, stat)
+        if cached is not None and cached.size == (width, height):
+            return cached
+        with Image.open(frame_path) as frame:
+            if frame.size != (width, height):
+                raise RuntimeError(
+                    f"Frame {frame_path} is {frame.size[0]}x{frame.size[1]}, "
+                    f"expected {width}x{height}"
+                )
+            rgba = clear_transparent(frame.convert("RGBA"))
+    except OSError as exc:
+        raise RuntimeError(f"Cannot decode {frame_path}: {exc}") from exc
+    if keep:
+        FRAME_CACHE.put(frame_path, stat, rgba)
+    return rgba
+
+
+ROW_CACHE_DIR = ".rowcache"
+
+
+def row_cache_paths(plan, frame_size, stitch_mode):
+    # One strip per row, keyed by the content of its frames and the tile geometry.
+    cache_dir = os.path.join(plan.object_dir, ROW_CACHE_DIR)
+    paths = []
+    for row_frames in plan.rows:
+        hashes = [plan.frame_hashes.get(path) or hash_file(path) for path in row_frames]
+        payload = json.dumps([stitch_mode, list(frame_size), hashes, PILLOW_PIXELS_VERSION])
+        key = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+        paths.append(os.path.join(cache_dir, f"{stitch_mode}-{key}.png"))
+    return paths
+
+
+def prune_row_cache(row_paths):
+    if not row_paths:
+        return
+    cache_dir = os.path.dirname(row_paths[0])
+    keep = {os.path.basename(path) for path in row_paths}
+    for entry in os.scandir(cache_dir):
+        if entry.is_file() and entry.name not in keep:
+            os.remove(entry.path)
+
+
+def open_cached_strip(strip_path, size):
+    try:
+        with Image.open(strip_path) as strip:
+            if strip.size != size:
+                return None
+            return strip.convert("RGBA")
+    except OSError:
+        return None
+
+
+SCALE_FILTERS = ("nearest", "box")
+
+
+def parse_scales(scales, frame_size):
+    # Extra downscaled variants; every frame must stay whole pixels so the grid is exact.
+    parsed = []
+    for scale in scales or []:
+        if isinstance(scale, bool) or not isinstance(scale, (int, float)) or not 0 < scale <= 1:
+            raise RuntimeError(f"Invalid scale {scale!r}: expected a number in (0, 1]")
+        if scale == 1:
+            continue
+        for size in frame_size:
+            scaled = size * scale
+            if abs(scaled - round(scaled)) > 1e-9 or round(scaled) < 1:
+                raise RuntimeError(
+                    f"Invalid scale {scale:g}: frame size {frame_size[0]}x{frame_size[1]} "
+                    "does not scale to whole pixels"
+                )
+        if scale not in parsed:
+            parsed.append(scale)
+    return sorted(parsed, reverse=True)
+
+
+def scaled_output_path(output_path, scale):
+    base, ext = os.path.splitext(output_path)
+    return f"{base}@{scale:g}x{ext}"
+
+
+def scale_variants(output_path, scales, scale_filter, frame_size):
+    scales = parse_scales(scales, frame_size)
+    if not scales:
+        return []
+    if scale_filter not in SCALE_FILTERS:
+        raise RuntimeError(
+            f"Invalid scale_filter '{scale_filter}', expected one of {', '.join(SCALE_FILTERS)}"
+        )
+    if Image is None:
+        raise RuntimeError("Pillow is required for profile scales (pip install Pillow)")
+    resample = Image.NEAREST if scale_filter == "nearest" else Image.BOX
+    return [(scale, scaled_output_path(output_path, scale), resample) for scale in scales]
+
+
+def scale_image(image, scale, resample):
+    # Frame sizes scale to whole pixels, so box cells never straddle two frames.
+    return image.resize((round(image.width * scale), round(image.height * scale)), resample)
+
+
+def write_scaled_variants(output_path, variants):
+    # ImageMagick modes: decode the finished sheet once and derive every variant from it.
+    with Image.open(output_path) as sheet:
+        sheet = sheet.convert("RGBA")
+    for scale, variant_path, resample in variants:
+        scale_image(sheet, scale, resample).save(variant_path, format="PNG")
+
+
+def load_row_strip(row_frames, frame_size, strip_path=None, keep_frames=True):
+    # Returns (strip, cached): the row's frames side by side, from the cache when valid.
+    # keep_frames=False reads the frame cache but never fills it (bounded-memory paths).
+    width, height = frame_size
+    strip_size = (len(row_frames) * width, height)
+    if strip_path and os.path.isfile(strip_path):
+        strip = open_cached_strip(strip_path, strip_size)
+        if strip is not None:
+            return strip, True
+    strip = Image.new("RGBA", strip_size, (0, 0, 0, 0))
+    for col_idx, frame_path in enumerate(row_frames):
+        frame = open_frame_rgba(frame_path, frame_size, keep=keep_frames)
+        strip.paste(frame, (col_idx * width, 0))
+    if strip_path:
+        tmp_path = f"{strip_path}.{os.getpid()}.tmp"
+        strip.save(tmp_path, format="PNG", compress_level=1)
+        os.replace(tmp_path, strip_path)
+    return strip, False
+
+
+def stitch_native(
+    rows,
+    max_columns,
+    frame_size,
     output_path,
-    profile,
+    progress=None,
+    row_cache=None,
+    trace=None,
+    variants=None,
+):
+    if Image is None:
+        raise RuntimeError("Pillow is required for --stitch native (pip install Pillow)")
+    width, height = frame_size
+    if row_cache:
+        os.makedirs(os.path.dirname(row_cache[0]), exist_ok=True)
+    # Montage fills unused cells with "-background none", i.e. transparent black.
+    sheet = Image.new("RGBA", (max_columns * width, len(rows) * height), (0, 0, 0, 0))
+    reused = 0
+    with trace_span(trace, "stitch", rows=len(rows)):
+        for row_idx, row_frames in enumerate(rows):
+            with trace_span(trace, f"row {row_idx + 1}", "row") as span:
+                strip_path = row_cache[row_idx] if row_cache else None
+                strip, cached = load_row_strip(row_frames, frame_size, strip_path)
+                if cached:
+                    reused += 1
+                sheet.paste(strip, (0, row_idx * height))
+                span["cached"] = cached
+            report_progress(progress, "stitch", row=row_idx + 1, rows=len(rows), cached=cached)
+    if row_cache:
+        logging.info("Row cache: %s reused %d/%d rows", output_path, reused, len(rows))
+    report_progress(progress, "encode")
+    with trace_span(trace, "encode"):
+        sheet.save(output_path, format="PNG")
+        for scale, variant_path, resample in variants or []:
+            scale_image(sheet, scale, resample).save(variant_path, format="PNG")
+
+
+PNG_IDAT_CHUNK_SIZE = 1 << 16
+
+
+class PngStreamWriter:
+    # 8-bit RGBA PNG written one block of scanlines at a time: only the zlib state, the
+    # caller's block and one pending IDAT chunk are held in memory.
+    def __init__(self, handle, width, height, level=6):
+        self.handle = handle
+        self.stride = width * 4
+        self.compressor = zlib.compressobj(level)
+        self.pending = bytearray()
+        self.prior = 0
+        self.high = int.from_bytes(b"\x80" * self.stride, "big")
+        self.low = int.from_bytes(b"\x7f" * self.stride, "big")
+        handle.write(PNG_SIGNATURE)
+        handle.write(png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)))
+
+    def subtract(self, value, previous):
+        # Bytewise (value - previous) mod 256 on whole scanlines held as big ints.
+        high = self.high
+        diff = ((value | high) - (previous & self.low)) ^ ((value ^ ~previous) & high)
+        return diff.to_bytes(self.stride, "big")
+
+    def filtered_lines(self, pixels, line_stride, padding, filter_type):
+        # PNG filters 0 (None), 1 (Sub, 4 bytes per pixel) and 2 (Up), one scanline
+        # at a time; each line is the block's pixels plus transparent padding.
+        prior = self.prior
+        tag = bytes((filter_type,))
+        for start in range(0, len(pixels), line_stride):
+            line = pixels[start : start + line_stride] + padding
+            value = int.from_bytes(line, "big")
+            if filter_type == 1:
+                line = self.subtract(value, value >> 32)
+            elif filter_type == 2:
+                line = self.subtract(value, prior)
+            prior = value
+            yield tag + line, value
+
+    def write_block(self, pixels, line_stride, padding=b""):
+        # One filter per block, picked by a quick level-1 trial: flat pixel art usually
+        # prefers None, smooth gradients Up or Sub. Trials stream too, nothing is buffered.
+        best_type, best_size = 0, None
+        for filter_type in (0, 1, 2):
+            trial = zlib.compressobj(1)
+            size = 0
+            for data, _ in self.filtered_lines(pixels, line_stride, padding, filter_type):
+                size += len(trial.compress(data))
+            size += len(trial.flush())
+            if best_size is None or size < best_size:
+                best_type, best_size = filter_type, size
+        for data, value in self.filtered_lines(pixels, line_stride, padding, best_type):
+            self.pending += self.compressor.compress(data)
+            self.prior = value
+            if len(self.pending) >= PNG_IDAT_CHUNK_SIZE:
+                self.handle.write(png_chunk(b"IDAT", bytes(self.pending)))
+                self.pending.clear()
+
+    def close(self):
+        self.pending += self.compressor.flush()
+        self.handle.write(png_chunk(b"IDAT", bytes(self.pending)))
+        self.pending.clear()
+        self.handle.write(png_chunk(b"IEND", b""))
+
+
+def stitch_stream(
+    rows,
+    max_columns,
     frame_size,
+    output_path,
+    progress=None,
+    row_cache=None,
+    trace=None,
+    variants=None,
+):
+    # Same sheet as stitch_native, but only one row of tiles is decoded at a time and
+    # its scanlines go straight to the compressor: peak memory is one strip, not the sheet.
+    if Image is None:
+        raise RuntimeError("Pillow is required for --stitch stream (pip install Pillow)")
+    width, height = frame_size
+    if row_cache:
+        os.makedirs(os.path.dirname(row_cache[0]), exist_ok=True)
+    stride = max_columns * width * 4
+    reused = 0
+    with contextlib.ExitStack() as stack:
+        handle = stack.enter_context(open(output_path, "wb"))
+        writer = PngStreamWriter(handle, max_columns * width, len(rows) * height)
+        # Each variant gets its own writer and is fed the same decoded strip, downscaled.
+        scaled_writers = []
+        for scale, variant_path, resample in variants or []:
+            variant_handle = stack.enter_context(open(variant_path, "wb"))
+            scaled_width = round(max_columns * width * scale)
+            scaled_writers.append(
+                (
+                    PngStreamWriter(
+                        variant_handle, scaled_width, round(len(rows) * height * scale)
+                    ),
+                    scale,
+                    resample,
+                    scaled_width * 4,
+                )
+            )
+        with trace_span(trace, "stitch", rows=len(rows)):
+            for row_idx, row_frames in enumerate(rows):
+                with trace_span(trace, f"row {row_idx + 1}", "row") as span:
+                    strip_path = row_cache[row_idx] if row_cache else None
+                    strip, cached = load_row_strip(
+                        row_frames, frame_size, strip_path, keep_frames=False
+                    )
+                    if cached:
+                        reused += 1
+                    for scaled_writer, scale, resample, scaled_stride in scaled_writers:
+                        scaled = scale_image(strip, scale, resample)
+                        scaled_writer.write_block(
+                            scaled.tobytes(),
+                            scaled.width * 4,
+                            bytes(scaled_stride - scaled.width * 4),
+                        )
+                    pixels = strip.tobytes()
+                    del strip
+                    strip_stride = len(row_frames) * width * 4
+                    # Unused cells stay transparent black, as with montage.
+                    writer.write_block(pixels, strip_stride, bytes(stride - strip_stride))
+                    span["cached"] = cached
+                report_progress(
+                    progress, "stitch", row=row_idx + 1, rows=len(rows), cached=cached
+                )
+        report_progress(progress, "encode")
+        with trace_span(trace, "encode"):
+            writer.close()
+            for scaled_writer, _, _, _ in scaled_writers:
+                scaled_writer.close()
+    if row_cache:
+        logging.info("Row cache: %s reused %d/%d rows", output_path, reused, len(rows))
+
+
+ATLAS_PADDING = 1
+ATLAS_MAX_SIZE = 8192
+
+
+def next_power_of_two(value):
+    size = 1
+    while size < value:
+        size *= 2
+    return size
+
+
+def pack_shelves(sizes, width, padding=ATLAS_PADDING):
+    x = 0
+    y = 0
+    shelf_height = 0
+    positions = {}
+    for key, (rect_w, rect_h) in sizes:
+        if x and x + rect_w > width:
+            y += shelf_height + padding
+            x = 0
+            shelf_height = 0
+        positions[key] = (x, y)
+        x += rect_w + padding
+        shelf_height = max(shelf_height, rect_h)
+    return positions, y + shelf_height
+
+
+def pack_atlas(sizes):
+    # Shelf packing, tallest first, at every power-of-two width; keep the smallest atlas.
+    order = sorted(sizes.items(), key=lambda item: (-item[1][1], -item[1][0], item[0]))
+    widest = max((rect_w for rect_w, _ in sizes.values()), default=1)
+    best = None
+    width = next_power_of_two(max(widest, 1))
+    while width <= ATLAS_MAX_SIZE:
+        positions, used_height = pack_shelves(order, width)
+        height = next_power_of_two(max(used_height, 1))
+        if height <= ATLAS_MAX_SIZE:
+            key = (width * height, abs(width - height))
+            if best is None or key < best[0]:
+                best = (key, width, height, positions)
+        width *= 2
+    if best is None:
+        raise RuntimeError(f"Frames do not fit in a {ATLAS_MAX_SIZE}px atlas")
+    _, width, height, positions = best
+    return width, height, positions
+
+
+def atlas_sidecar_path(output_path):
+    return f"{os.path.splitext(output_path)[0]}.json"
+
+
+def build_atlas(plan, frame_size, output_path, progress=None, trace=None):
+    if Image is None:
+        raise RuntimeError("Pillow is required for --layout atlas (pip install Pillow)")
+    width, height = frame_size
+    unique = {}
+    frames = []
+    with trace_span(trace, "stitch", rows=len(plan.rows)):
+        for row_idx, (label, row_frames) in enumerate(zip(plan.row_labels, plan.rows)):
+            with trace_span(trace, f"row {row_idx + 1}", "row"):
+                for frame_idx, frame_path in enumerate(row_frames):
+                    frame = open_frame_rgba(frame_path, frame_size)
+                    bbox = frame.getchannel("A").getbbox()
+                    trimmed = frame.crop(bbox) if bbox else None
+                    digest = None
+                    if trimmed is not None:
+                        digest = hashlib.sha1(
+                            f"{trimmed.size}".encode("ascii") + trimmed.tobytes()
+                        ).hexdigest()
+                        unique.setdefault(digest, trimmed)
+                    frames.append(
+                        {
+                            "action": label["action"],
+                            "folder": label["folder"],
+                            "direction": label["direction"],
+                            "frame": frame_idx,
+                            "row": row_idx,
+                            "digest": digest,
+                            "offset": [bbox[0], bbox[1]] if bbox else [0, 0],
+                        }
+                    )
+            report_progress(progress, "stitch", row=row_idx + 1, rows=len(plan.rows))
+
+        atlas_w, atlas_h, positions = pack_atlas(
+            {digest: image.size for digest, image in unique.items()}
+        )
+        atlas = Image.new("RGBA", (atlas_w, atlas_h), (0, 0, 0, 0))
+        for digest, image in unique.items():
+            atlas.paste(image, positions[digest])
+    for entry in frames:
+        digest = entry.pop("digest")
+        if digest is None:
+            entry["rect"] = [0, 0, 0, 0]
+            continue
+        x, y = positions[digest]
+        entry["rect"] = [x, y, unique[digest].size[0], unique[digest].size[1]]
+    report_progress(progress, "encode")
+    with trace_span(trace, "encode"):
+        atlas.save(output_path, format="PNG")
+
+    sidecar = {
+        "image": os.path.basename(output_path),
+        "size": [atlas_w, atlas_h],
+        "frame_size": [width, height],
+        "unique_frames": len(unique),
+        "row_frame_counts": plan.row_frame_counts,
+        "frames": frames,
+    }
+    sidecar_path = atlas_sidecar_path(output_path)
+    with open(sidecar_path, "w", encoding="utf-8") as handle:
+        json.dump(sidecar, handle, indent=1)
+    return sidecar_path
+
+
+RAW_SHEET_MAGIC = b"GGSHEET\x00"
+RAW_SHEET_VERSION = 1
+# magic, version, flags, frame width, frame height, rows, frames, metadata size, data offset
+RAW_SHEET_HEADER = struct.Struct("<8sHHIIIIII")
+# Per frame: absolute offset and stored size of its pixels.
+RAW_SHEET_INDEX = struct.Struct("<QQ")
+RAW_SHEET_ALIGN = 64
+RAW_FLAG_PREMULTIPLIED = 0x1
+RAW_FLAG_ZLIB = 0x2
+RAW_SHEET_COMPRESSIONS = ("raw", "zlib")
+
+
+def raw_sheet_path(output_path):
+    return f"{os.path.splitext(output_path)[0]}.rgba"
+
+
+def write_raw_sheet(plan, frame_size, raw_path, compression="raw", strip_paths=None):
+    # Frames are stored one after another in row order, premultiplied RGBA, with no
+    # padding cells; "raw" frames of a row form one contiguous range.
+    if Image is None:
+        raise RuntimeError("Pillow is required for --raw-sheet (pip install Pillow)")
+    if compression not in RAW_SHEET_COMPRESSIONS:
+        raise RuntimeError(f"Invalid raw sheet compression '{compression}'")
+    width, height = frame_size
+    metadata = json.dumps(
+        {
+            "columns": plan.max_columns,
+            "row_frame_counts": plan.row_frame_counts,
+            "rows": plan.row_labels,
+        }
+    ).encode("utf-8")
+    frame_total = sum(plan.row_frame_counts)
+    index_offset = RAW_SHEET_HEADER.size + len(metadata)
+    data_offset = index_offset + frame_total * RAW_SHEET_INDEX.size
+    data_offset += -data_offset % RAW_SHEET_ALIGN
+    flags = RAW_FLAG_PREMULTIPLIED | (RAW_FLAG_ZLIB if compression == "zlib" else 0)
+    index = []
+    with open(raw_path, "wb") as handle:
+        handle.write(
+            RAW_SHEET_HEADER.pack(
+                RAW_SHEET_MAGIC,
+                RAW_SHEET_VERSION,
+                flags,
+                width,
+                height,
+                len(plan.rows),
+                frame_total,
+                len(metadata),
+                data_offset,
+            )
+        )
+        handle.write(metadata)
+        handle.write(bytes(data_offset - index_offset))
+        for row_idx, row_frames in enumerate(plan.rows):
+            # Reuse a cached row strip when one exists, never create one here.
+            strip_path = strip_paths[row_idx] if strip_paths else None
+            if strip_path and not os.path.isfile(strip_path):
+                strip_path = None
+            strip, _ = load_row_strip(row_frames, frame_size, strip_path)
+            strip = strip.convert("RGBa")
+            for col_idx in range(len(row_frames)):
+                data = strip.crop(
+                    (col_idx * width, 0, (col_idx + 1) * width, height)
+                ).tobytes()
+                if compression == "zlib":
+                    data = zlib.compress(data, 6)
+                index.append(RAW_SHEET_INDEX.pack(handle.tell(), len(data)))
+                handle.write(data)
+        handle.seek(index_offset)
+        handle.write(b"".join(index))
+    return raw_path
+
+
+class RawSheet:
+    # Reader for .rgba sheets: frames are zero-copy memoryviews over an mmap.
+    # Release every view taken from the sheet before close().
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as handle:
+            self.buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.buffer)
+        try:
+            (
+                magic,
+                version,
+                self.flags,
+                self.frame_width,
+                self.frame_height,
+                row_count,
+                frame_total,
+                metadata_size,
+                self.data_offset,
+            ) = RAW_SHEET_HEADER.unpack_from(self.view)
+            if magic != RAW_SHEET_MAGIC or version != RAW_SHEET_VERSION:
+                raise ValueError(f"{path} is not a version {RAW_SHEET_VERSION} raw sheet")
+            start = RAW_SHEET_HEADER.size
+            metadata = json.loads(bytes(self.view[start : start + metadata_size]))
+            self.index = list(
+                RAW_SHEET_INDEX.iter_unpack(
+                    self.view[
+                        start + metadata_size : start
+                        + metadata_size
+                        + frame_total * RAW_SHEET_INDEX.size
+                    ]
+                )
+            )
+        except (struct.error, ValueError):
+            self.close()
+            raise
+        self.columns = metadata["columns"]
+        self.row_frame_counts = metadata["row_frame_counts"]
+        self.row_labels = metadata["rows"]
+        self.row_starts = []
+        total = 0
+        for count in self.row_frame_counts:
+            self.row_starts.append(total)
+            total += count
+        if len(self.row_frame_counts) != row_count or total != frame_total:
+            self.close()
+            raise ValueError(f"{path}: row table does not match the frame index")
+
+    @property
+    def compressed(self):
+        return bool(self.flags & RAW_FLAG_ZLIB)
+
+    @property
+    def frame_bytes(self):
+        return self.frame_width * self.frame_height * 4
+
+    def frame_index(self, row, col):
+        if not 0 <= col < self.row_frame_counts[row]:
+            raise IndexError(f"Frame {col} out of range for row {row}")
+        return self.row_starts[row] + col
+
+    def frame(self, row, col):
+        # Premultiplied RGBA ("RGBa" in Pillow); a view for raw sheets, bytes for zlib.
+        offset, size = self.index[self.frame_index(row, col)]
+        data = self.view[offset : offset + size]
+        if self.compressed:
+            return zlib.decompress(data)
+        return data
+
+    def frames(self, row, start=0, stop=None):
+        # A contiguous range of one row's frames, e.g. for a single texture upload.
+        if self.compressed:
+            raise ValueError("Frame ranges need an uncompressed (raw) sheet")
+        stop = self.row_frame_counts[row] if stop is None else stop
+        if not 0 <= start < stop <= self.row_frame_counts[row]:
+            raise IndexError(f"Frames {start}:{stop} out of range for row {row}")
+        offset = self.index[self.row_starts[row] + start][0]
+        return self.view[offset : offset + (stop - start) * self.frame_bytes]
+
+    def find_row(self, action, direction, folder=None):
+        for row, label in enumerate(self.row_labels):
+            if label["action"] == action and label["direction"] == direction:
+                if folder is None or label["folder"] == folder:
+                    return row
+        raise KeyError(f"No row for {action}/{direction}")
+
+    def close(self):
+        self.view.release()
+        self.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+@dataclasses.dataclass
+class BuildPlan:
+    object_dir: str
+    entries: list
+    rows: list
+    row_frame_counts: list
+    row_labels: list
+    input_paths: list
+    input_stats: dict
+    latest_mtime: float
+    frame_hashes: dict = dataclasses.field(default_factory=dict)
+
+    @property
+    def max_columns(self):
+        return max(self.row_frame_counts)
+
+    def to_dict(self):
+        return {
+            "object_dir": self.object_dir,
+            "entries": self.entries,
+            "rows": [
+                dict(label, frames=frames)
+                for label, frames in zip(self.row_labels, self.rows)
+            ],
+            "columns": self.max_columns,
+            "input_count": len(self.input_paths),
+            "latest_mtime": self.latest_mtime,
+        }
+
+
+def scan_pngs(folder):
+    # DirEntry.stat() reuses the data scandir already fetched on most platforms.
+    files = []
+    for entry in os.scandir(folder):
+        if entry.is_file() and entry.name.lower().endswith(".png"):
+            files.append((entry.name, entry.stat()))
+    files.sort(key=lambda item: item[0])
+    return files
+
+
+def plan_build(
+    object_dir,
+    profile,
     input_direction_order,
     attack_folder_priority,
     attack_extra_folders,
-    timeout_seconds=None,
-    verbose=False,
-    precheck=False,
-    stitch_mode="montage",
 ):
     subdirs = [name for name, _ in list_dirs(object_dir)]
     ordered_attack_folders = pick_ordered_attack_folders(subdirs)
@@ -269,19 +1161,26 @@ def build_sprite_sheet(
 
     rows = []
     row_frame_counts = []
+    row_labels = []
+    input_paths = []
+    input_stats = {}
     frames_per_view_config = profile.get("frames_per_view", {})
     max_mtime = 0.0
     if len(input_direction_order) < 1:
         raise RuntimeError("input_direction_order must have at least 1 entry")
     for entry in action_entries:
         full_path = os.path.join(object_dir, entry["folder"])
-        files = list_pngs(full_path)
-        if not files:
+        scanned = scan_pngs(full_path)
+        if not scanned:
             raise RuntimeError(f"No PNGs in {full_path}")
-        for filename in files:
-            mtime = os.path.getmtime(os.path.join(full_path, filename))
-            if mtime > max_mtime:
-                max_mtime = mtime
+        files = []
+        for filename, stat in scanned:
+            frame_path = os.path.join(full_path, filename)
+            files.append(filename)
+            input_paths.append(frame_path)
+            input_stats[frame_path] = stat
+            if stat.st_mtime > max_mtime:
+                max_mtime = stat.st_mtime
         if len(files) % len(input_direction_order) != 0:
             raise RuntimeError(
                 f"Expected PNG count divisible by {len(input_direction_order)} in {full_path}"
@@ -295,6 +1194,7 @@ def build_sprite_sheet(
                 f"Not enough frames for {entry['folder']} in {object_dir} "
                 f"(need {desired}, have {frames_per_view_total})"
             )
+        entry["frames_per_view"] = desired
         frames_by_direction = {}
         for idx, direction in enumerate(input_direction_order):
             start = idx * frames_per_view_total
@@ -310,11 +1210,118 @@ def build_sprite_sheet(
             row_frames = frames_by_direction[direction][:desired]
             rows.append(row_frames)
             row_frame_counts.append(desired)
+            row_labels.append(
+                {"action": entry["action"], "folder": entry["folder"], "direction": direction}
+            )
 
     if not rows:
         raise RuntimeError(f"No rows generated for {object_dir}")
 
+    return BuildPlan(
+        object_dir=object_dir,
+        entries=action_entries,
+        rows=rows,
+        row_frame_counts=row_frame_counts,
+        row_labels=row_labels,
+        input_paths=input_paths,
+        input_stats=input_stats,
+        latest_mtime=max_mtime,
+    )
+
+
+def build_sprite_sheet(
+    magick_cmds,
+    object_dir,
+    output_path,
+    profile,
+    frame_size,
+    input_direction_order,
+    attack_folder_priority,
+    attack_extra_folders,
+    timeout_seconds=None,
+    verbose=False,
+    precheck=False,
+    stitch_mode="montage",
+    plan=None,
+    progress=None,
+    layout="grid",
+    row_cache=False,
+    trace=None,
+    scales=None,
+    scale_filter=None,
+    raw_sheet=None,
+):
+    if plan is None:
+        plan = plan_build(
+            object_dir,
+            profile,
+            input_direction_order,
+            attack_folder_priority,
+            attack_extra_folders,
+        )
+    rows = plan.rows
+    row_frame_counts = plan.row_frame_counts
+    max_mtime = plan.latest_mtime
+
     max_columns = max(row_frame_counts)
+    variants = scale_variants(
+        output_path,
+        profile.get("scales") if scales is None else scales,
+        scale_filter or profile.get("scale_filter", "nearest"),
+        frame_size,
+    )
+    if precheck:
+        unique_frames = sorted({frame for row in rows for frame in row})
+        logging.info("Precheck start: %s (%d files)", output_path, len(unique_frames))
+        if verbose:
+            print(f"Precheck {output_path} files={len(unique_frames)}")
+        report_progress(progress, "precheck", files=len(unique_frames))
+        with trace_span(trace, "precheck", files=len(unique_frames)):
+            precheck_pngs(unique_frames, frame_size)
+        logging.info("Precheck done: %s", output_path)
+
+    if layout == "atlas":
+        if variants:
+            raise RuntimeError("Profile scales are not supported with --layout atlas")
+        if raw_sheet:
+            raise RuntimeError("--raw-sheet is not supported with --layout atlas")
+        logging.info("Atlas start: %s frames=%d", output_path, sum(row_frame_counts))
+        if verbose:
+            print(f"Atlas {output_path} frames={sum(row_frame_counts)}")
+        build_atlas(plan, frame_size, output_path, progress=progress, trace=trace)
+        logging.info("Atlas done: %s", output_path)
+        return max_mtime
+
+    if stitch_mode in ("native", "stream"):
+        label = stitch_mode.capitalize()
+        logging.info(
+            "%s start: %s rows=%d cols=%d", label, output_path, len(rows), max_columns
+        )
+        if verbose:
+            print(f"{label} {output_path} rows={len(rows)} cols={max_columns}")
+        row_paths = row_cache_paths(plan, frame_size, stitch_mode) if row_cache else None
+        stitch = stitch_stream if stitch_mode == "stream" else stitch_native
+        stitch(
+            rows,
+            max_columns,
+            frame_size,
+            output_path,
+            progress=progress,
+            row_cache=row_paths,
+            trace=trace,
+            variants=variants,
+        )
+        if row_paths:
+            prune_row_cache(row_paths)
+        if raw_sheet:
+            with trace_span(trace, "raw"):
+                write_raw_sheet(
+                    plan, frame_size, raw_sheet_path(output_path), raw_sheet, row_paths
+                )
+        logging.info("%s done: %s", label, output_path)
+        return max_mtime
+
+    cached_paths = None
     with tempfile.TemporaryDirectory() as tmpdir:
         blank_path = os.path.join(tmpdir, "blank.png")
         width, height = frame_size
@@ -339,52 +1346,73 @@ def build_sprite_sheet(
 
         tile = f"{max_columns}x{len(rows)}"
         geometry = f"{width}x{height}+0+0"
-        if precheck:
-            unique_frames = sorted({frame for row in rows for frame in row})
-            logging.info("Precheck start: %s (%d files)", output_path, len(unique_frames))
-            if verbose:
-                print(f"Precheck {output_path} files={len(unique_frames)}")
-            precheck_pngs(magick_cmds, unique_frames, timeout_seconds=timeout_seconds)
-            logging.info("Precheck done: %s", output_path)
 
         if stitch_mode == "append":
             row_paths = []
+            cached_paths = row_cache_paths(plan, frame_size, stitch_mode) if row_cache else None
+            if cached_paths:
+                os.makedirs(os.path.dirname(cached_paths[0]), exist_ok=True)
             logging.info("Append start: %s rows=%d cols=%d", output_path, len(rows), max_columns)
             if verbose:
                 print(f"Append {output_path} rows={len(rows)} cols={max_columns}")
-            for idx, row_frames in enumerate(rows):
-                if not row_frames:
-                    raise RuntimeError(f"No frames for row {idx} in {object_dir}")
-                row_path = os.path.join(tmpdir, f"row_{idx:03d}.png")
+            reused = 0
+            with trace_span(trace, "stitch", rows=len(rows)):
+                for idx, row_frames in enumerate(rows):
+                    if not row_frames:
+                        raise RuntimeError(f"No frames for row {idx} in {object_dir}")
+                    if cached_paths and os.path.isfile(cached_paths[idx]):
+                        # Untouched rows skip their convert +append entirely.
+                        row_paths.append(cached_paths[idx])
+                        reused += 1
+                        report_progress(
+                            progress, "stitch", row=idx + 1, rows=len(rows), cached=True
+                        )
+                        continue
+                    row_path = os.path.join(tmpdir, f"row_{idx:03d}.png")
+                    if cached_paths:
+                        row_path = f"{cached_paths[idx][:-4]}.{os.getpid()}.tmp.png"
+                    with trace_span(trace, f"row {idx + 1}", "row", frames=len(row_frames)):
+                        subprocess.run(
+                            magick_cmds["convert"]
+                            + row_frames
+                            + [
+                                "+append",
+                                "-quiet",
+                                "-define",
+                                "png:exclude-chunks=all",
+                                "-strip",
+                                row_path,
+                            ],
+                            check=True,
+                            timeout=timeout_seconds,
+                        )
+                    if cached_paths:
+                        os.replace(row_path, cached_paths[idx])
+                        row_path = cached_paths[idx]
+                    row_paths.append(row_path)
+                    report_progress(
+                        progress, "stitch", row=idx + 1, rows=len(rows), cached=False
+                    )
+            with trace_span(trace, "encode"):
                 subprocess.run(
                     magick_cmds["convert"]
-                    + row_frames
+                    + row_paths
                     + [
-                        "+append",
+                        "-append",
                         "-quiet",
                         "-define",
                         "png:exclude-chunks=all",
                         "-strip",
-                        row_path,
+                        output_path,
                     ],
                     check=True,
                     timeout=timeout_seconds,
                 )
-                row_paths.append(row_path)
-            subprocess.run(
-                magick_cmds["convert"]
-                + row_paths
-                + [
-                    "-append",
-                    "-quiet",
-                    "-define",
-                    "png:exclude-chunks=all",
-                    "-strip",
-                    output_path,
-                ],
-                check=True,
-                timeout=timeout_seconds,
-            )
+            if cached_paths:
+                prune_row_cache(cached_paths)
+                logging.info(
+                    "Row cache: %s reused %d/%d rows", output_path, reused, len(rows)
+                )
             logging.info("Append done: %s", output_path)
         else:
             logging.info(
@@ -395,82 +1423,1292 @@ def build_sprite_sheet(
             )
             if verbose:
                 print(f"Montage {output_path} tile={tile}")
-            subprocess.run(
-                magick_cmds["montage"]
-                + [
-                    "-quiet",
-                    "-define",
-                    "png:exclude-chunks=all",
-                    "-strip",
-                    "-background",
-                    "none",
-                    "-tile",
-                    tile,
-                    "-geometry",
-                    geometry,
-                    f"@{file_list_path}",
-                    output_path,
-                ],
-                check=True,
-                timeout=timeout_seconds,
-            )
+            # One montage call decodes, tiles and encodes: it is traced as a single span.
+            with trace_span(trace, "stitch", rows=len(rows), tile=tile):
+                subprocess.run(
+                    magick_cmds["montage"]
+                    + [
+                        "-quiet",
+                        "-define",
+                        "png:exclude-chunks=all",
+                        "-strip",
+                        "-background",
+                        "none",
+                        "-tile",
+                        tile,
+                        "-geometry",
+                        geometry,
+                        f"@{file_list_path}",
+                        output_path,
+                    ],
+                    check=True,
+                    timeout=timeout_seconds,
+                )
             logging.info("Montage done: %s", output_path)
+            report_progress(progress, "stitch", row=len(rows), rows=len(rows))
 
+    if variants:
+        with trace_span(trace, "scale", variants=len(variants)):
+            write_scaled_variants(output_path, variants)
+    if raw_sheet:
+        with trace_span(trace, "raw"):
+            write_raw_sheet(plan, frame_size, raw_sheet_path(output_path), raw_sheet, cached_paths)
     return max_mtime
 
 
-def needs_rebuild(output_path, latest_input_mtime, force_rebuild=False):
+MANIFEST_VERSION = 1
+
+
+def manifest_path_for(output_path):
+    folder, output_name = os.path.split(output_path)
+    return os.path.join(folder, f".{output_name}.manifest.json")
+
+
+def load_manifest(manifest_path):
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as handle:
+            manifest = json.load(handle)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def write_manifest(manifest_path, output_path, inputs, config_hash):
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "config_hash": config_hash,
+        "output": file_fingerprint(output_path),
+        "inputs": inputs,
+    }
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(manifest, handle, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+    return manifest
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_fingerprint(path, previous=None, stat=None):
+    if stat is None:
+        stat = os.stat(path)
+    if (
+        previous
+        and previous.get("size") == stat.st_size
+        and previous.get("mtime_ns") == stat.st_mtime_ns
+    ):
+        return previous
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": hash_file(path),
+    }
+
+
+def fingerprint_inputs(plan, previous=None):
+    # Only files whose size or mtime changed since the last manifest get re-hashed.
+    previous = previous or {}
+    inputs = {}
+    for path in plan.input_paths:
+        key = os.path.relpath(path, plan.object_dir).replace(os.sep, "/")
+        inputs[key] = file_fingerprint(path, previous.get(key), plan.input_stats[path])
+        plan.frame_hashes[path] = inputs[key]["sha256"]
+    return inputs
+
+
+def config_fingerprint(
+    profile,
+    frame_size,
+    input_direction_order,
+    attack_folder_priority,
+    attack_extra_folders,
+    stitch_mode,
+    layout="grid",
+    optimize=False,
+    raw_sheet=None,
+):
+    settings = {
+        "profile": profile,
+        "frame_size": list(frame_size),
+        "input_direction_order": list(input_direction_order),
+        "attack_folder_priority": list(attack_folder_priority),
+        "attack_extra_folders": list(attack_extra_folders),
+        "stitch_mode": stitch_mode,
+    }
+    # Only non-default settings are added so existing manifests stay valid.
+    if layout != "grid":
+        settings["layout"] = layout
+    if stitch_mode in ("native", "stream") or layout == "atlas":
+        settings["pillow_pixels"] = PILLOW_PIXELS_VERSION
+    if optimize:
+        settings["optimize"] = True
+    if raw_sheet:
+        settings["raw_sheet"] = raw_sheet
+    payload = json.dumps(settings, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def inputs_match(recorded, current):
+    if set(recorded) != set(current):
+        return False
+    return all(
+        recorded[key].get("sha256") == current[key]["sha256"] for key in current
+    )
+
+
+def needs_rebuild(output_path, manifest, inputs, config_hash, force_rebuild=False):
     if force_rebuild:
         return True
     if not os.path.isfile(output_path):
         return True
-    return os.path.getmtime(output_path) < latest_input_mtime
+    if not manifest or manifest.get("config_hash") != config_hash:
+        return True
+    recorded_output = manifest.get("output") or {}
+    if file_fingerprint(output_path, recorded_output).get("sha256") != recorded_output.get(
+        "sha256"
+    ):
+        return True
+    return not inputs_match(manifest.get("inputs") or {}, inputs)
 
 
-def copy_to_targets(output_path, output_name, object_type, config):
-    game_root = config["game_root"]
-    targets = config["targets"]
-    if object_type == "enemy":
-        bucket = "enemys"
-    elif object_type == "npc":
-        bucket = "NPC"
-    elif object_type == "item":
-        bucket = "items"
-    elif object_type == "hero":
-        bucket = "character"
-    else:
-        bucket = "weapons"
-    for target in targets:
-        dest_dir = os.path.join(game_root, target, bucket)
-        os.makedirs(dest_dir, exist_ok=True)
-        dest_path = os.path.join(dest_dir, output_name)
-        if not os.path.isfile(dest_path):
-            shutil.copy2(output_path, dest_path)
-            continue
-        if os.path.getmtime(dest_path) < os.path.getmtime(output_path):
-            shutil.copy2(output_path, dest_path)
+PNG_ZLIB_STRATEGIES = (-1, zlib.Z_FILTERED, zlib.Z_RLE)
 
 
-def remove_existing_outputs(output_path, output_name, object_type, config):
-    if os.path.isfile(output_path):
-        os.remove(output_path)
-    game_root = config["game_root"]
-    targets = config["targets"]
-    if object_type == "enemy":
-        bucket = "enemys"
-    elif object_type == "npc":
-        bucket = "NPC"
-    elif object_type == "item":
-        bucket = "items"
-    elif object_type == "hero":
-        bucket = "character"
-    else:
-        bucket = "weapons"
-    for target in targets:
-        dest_dir = os.path.join(game_root, target, bucket)
-        dest_path = os.path.join(dest_dir, output_name)
-        if os.path.isfile(dest_path):
-            os.remove(dest_path)
+def exact_palette_image(rgba):
+    # Lossless RGBA -> P only when the sheet has <= 256 distinct RGBA values.
+    colors = rgba.getcolors(256)
+    if colors is None:
+        return None
+    lookup = {
+        int.from_bytes(bytes(color), sys.byteorder): index
+        for index, (_, color) in enumerate(colors)
+    }
+    indices = bytes(map(lookup.__getitem__, memoryview(rgba.tobytes()).cast("I")))
+    paletted = Image.frombytes("P", rgba.size, indices)
+    paletted.putpalette(b"".join(bytes(color) for _, color in colors), rawmode="RGBA")
+    return paletted
+
+
+def optimize_png(path):
+    if Image is None:
+        raise RuntimeError("Pillow is required for --optimize (pip install Pillow)")
+    before = os.path.getsize(path)
+    with Image.open(path) as img:
+        rgba = img.convert("RGBA")
+    reference = rgba.tobytes()
+    candidates = [rgba]
+    paletted = exact_palette_image(rgba)
+    if paletted is not None:
+        candidates.insert(0, paletted)
+    best = None
+    for candidate in candidates:
+        for strategy in PNG_ZLIB_STRATEGIES:
+            buffer = io.BytesIO()
+            candidate.save(buffer, format="PNG", compress_level=9, compress_type=strategy)
+            data = buffer.getvalue()
+            if best is not None and len(data) >= len(best):
+                continue
+            buffer.seek(0)
+            with Image.open(buffer) as check:
+                if check.convert("RGBA").tobytes() != reference:
+                    continue
+            best = data
+    if best is None or len(best) >= before:
+        return before, before
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as handle:
+        handle.write(best)
+    os.replace(tmp_path, path)
+    return before, len(best)
+
+
+def format_savings(before, after):
+    saved = before - after
+    percent = (saved * 100.0 / before) if before else 0.0
+    return f"{before} -> {after} bytes (-{saved}, {percent:.1f}%)"
+
+
+def add_stats(totals, stats):
+    # Counters are summed, lists (trace events, timings) are concatenated.
+    for key, value in (stats or {}).items():
+        totals[key] = totals[key] + value if key in totals else value
+
+
+FICLONE = 0x40049409
+
+
+def target_bucket(object_type):
+    if object_type == "enemy":
+        return "enemys"
+    if object_type == "npc":
+        return "NPC"
+    if object_type == "item":
+        return "items"
+    if object_type == "hero":
+        return "character"
+    return "weapons"
+
+
+def same_content(source_path, dest_path, source_stat, source_hash):
+    try:
+        dest_stat = os.stat(dest_path)
+    except FileNotFoundError:
+        return False
+    if (dest_stat.st_dev, dest_stat.st_ino) == (source_stat.st_dev, source_stat.st_ino):
+        return True
+    if dest_stat.st_size != source_stat.st_size:
+        return False
+    # copy2 and reflink keep the mtime, so same size and mtime is a copy we placed.
+    if dest_stat.st_mtime_ns == source_stat.st_mtime_ns:
+        return True
+    if hash_file(dest_path) != source_hash():
+        return False
+    try:
+        # Same bytes with another mtime (e.g. a checkout in the game repo): align it
+        # so the next no-op run matches on stat alone.
+        os.utime(dest_path, ns=(dest_stat.st_atime_ns, source_stat.st_mtime_ns))
+    except OSError:
+        pass
+    return True
+
+
+def reflink(source_path, dest_path):
+    if not sys.platform.startswith("linux"):
+        return False
+    with open(source_path, "rb") as source, open(dest_path, "wb") as dest:
+        try:
+            fcntl.ioctl(dest.fileno(), FICLONE, source.fileno())
+        except OSError:
+            return False
+    shutil.copystat(source_path, dest_path)
+    return True
+
+
+def place_file(source_path, dest_path):
+    # Stage next to the destination, then swap it in: readers never see a partial file.
+    dest_dir, dest_name = os.path.split(dest_path)
+    tmp_path = os.path.join(dest_dir, f".{dest_name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        if reflink(source_path, tmp_path):
+            method = "reflink"
+        else:
+            try:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                os.link(source_path, tmp_path)
+                method = "hardlink"
+            except OSError:
+                shutil.copy2(source_path, tmp_path)
+                method = "copy"
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return method
+
+
+def distribute_outputs(output_files, object_type, config, trace=None, known_hashes=None):
+    # Every (output, target) pair runs on one shared thread pool. known_hashes maps an
+    # output path to the sha256 the manifest already holds, so it is not re-hashed.
+    game_root = config["game_root"]
+    bucket = target_bucket(object_type)
+    targets = config["targets"]
+    source_stats = {output_path: os.stat(output_path) for output_path, _ in output_files}
+    hashes = dict(known_hashes or {})
+
+    def source_hash(output_path):
+        if output_path not in hashes:
+            hashes[output_path] = hash_file(output_path)
+        return hashes[output_path]
+
+    def distribute(job):
+        output_path, output_name, target = job
+        with trace_span(trace, f"copy {target}", "copy", file=output_name) as span:
+            dest_dir = os.path.join(game_root, target, bucket)
+            os.makedirs(dest_dir, exist_ok=True)
+            dest_path = os.path.join(dest_dir, output_name)
+            if same_content(
+                output_path,
+                dest_path,
+                source_stats[output_path],
+                lambda: source_hash(output_path),
+            ):
+                span["method"] = "unchanged"
+            else:
+                span["method"] = place_file(output_path, dest_path)
+            return span["method"]
+
+    jobs = [
+        (output_path, output_name, target)
+        for output_path, output_name in output_files
+        for target in targets
+    ]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(targets))) as pool:
+        methods = list(pool.map(distribute, jobs))
+    for (_, output_name, target), method in zip(jobs, methods):
+        if method != "unchanged":
+            logging.info("Distributed %s to %s/%s (%s)", output_name, target, bucket, method)
+    return methods
+
+
+def copy_to_targets(output_path, output_name, object_type, config, trace=None):
+    return distribute_outputs([(output_path, output_name)], object_type, config, trace)
+
+
+def build_folder(name, path, object_type, profile, options, idx, total, stats=None):
+    config = options["config"]
+    force_rebuild = options["force_rebuild"]
+    output_base = output_name_for_folder(name)
+    output_base = validate_output_base(output_base, name)
+    output_name = f"{output_base}.png"
+    if not output_name or output_name == ".png":
+        print(f"Skipping {name}: invalid output name")
+        return "skipped"
+    output_path = os.path.join(path, output_name)
+
+    layout = options.get("layout", "grid")
+    trace = BuildTrace(name) if options.get("trace") else None
+    cache_hits, cache_misses = FRAME_CACHE.counters()
+    output_files = [(output_path, output_name)]
+    if layout == "atlas":
+        sidecar_path = atlas_sidecar_path(output_path)
+        output_files.append((sidecar_path, os.path.basename(sidecar_path)))
+    staging_dir = None
+
+    try:
+        input_direction_order = profile.get(
+            "input_direction_order", config["input_direction_order"]
+        )
+        attack_extra_folders = (
+            config.get("attack_extra_folders", []) if name.lower() == "w_shield" else []
+        )
+        for scale in parse_scales(profile.get("scales"), config["frame_size"]):
+            variant_path = scaled_output_path(output_path, scale)
+            output_files.append((variant_path, os.path.basename(variant_path)))
+        if options.get("raw_sheet"):
+            raw_path = raw_sheet_path(output_path)
+            output_files.append((raw_path, os.path.basename(raw_path)))
+        config_hash = config_fingerprint(
+            profile,
+            config["frame_size"],
+            input_direction_order,
+            config["attack_folder_priority"],
+            attack_extra_folders,
+            options["stitch"],
+            layout,
+            options.get("optimize", False),
+            options.get("raw_sheet"),
+        )
+        progress = options.get("progress")
+        report_progress(progress, "scan")
+        with trace_span(trace, "scan"):
+            plan = plan_build(
+                path,
+                profile,
+                input_direction_order,
+                config["attack_folder_priority"],
+                attack_extra_folders,
+            )
+        if stats is not None:
+            # Frame count for the build history, so main() does not rescan the folder.
+            add_stats(stats, {"frames": len(plan.input_paths)})
+        with trace_span(trace, "check", inputs=len(plan.input_paths)) as span:
+            manifest_path = manifest_path_for(output_path)
+            manifest = load_manifest(manifest_path)
+            inputs = fingerprint_inputs(plan, manifest.get("inputs") if manifest else None)
+            rebuild = needs_rebuild(output_path, manifest, inputs, config_hash, force_rebuild)
+            if not all(os.path.isfile(file_path) for file_path, _ in output_files):
+                rebuild = True
+            span["rebuild"] = rebuild
+        report_progress(
+            progress,
+            "check",
+            rows=len(plan.rows),
+            inputs=len(plan.input_paths),
+            rebuild=rebuild,
+        )
+        if options["dry_run"] and options["json"]:
+            payload = dict(plan.to_dict(), folder=name, output_path=output_path)
+            payload["needs_rebuild"] = rebuild
+            if stats is not None:
+                add_stats(stats, {"plans": [payload]})
+        if not rebuild:
+            if not options["dry_run"] and os.path.isfile(output_path):
+                if inputs != manifest["inputs"]:
+                    # Same content with new stats (touch, checkout): refresh the cache.
+                    write_manifest(manifest_path, output_path, inputs, config_hash)
+                report_progress(progress, "copy")
+                with trace_span(trace, "copy"):
+                    distribute_outputs(
+                        output_files,
+                        object_type,
+                        config,
+                        trace,
+                        {output_path: manifest["output"]["sha256"]},
+                    )
+            return "skipped"
+
+        if options["dry_run"]:
+            print(f"Would build: {name} ({idx}/{total})")
+            return "built"
+
+        print(f"Building {name} ({idx}/{total})...")
+        logging.info("Start build: %s", name)
+        start_time = time.time()
+        # Outputs are built in a hidden staging folder and swapped in with os.replace,
+        # so a sheet hardlinked into the targets is never rewritten in place.
+        staging_dir = tempfile.mkdtemp(prefix=".building-", dir=path)
+        staging_path = os.path.join(staging_dir, output_name)
+        build_sprite_sheet(
+            options["magick_cmds"],
+            path,
+            staging_path,
+            profile,
+            config["frame_size"],
+            input_direction_order,
+            config["attack_folder_priority"],
+            attack_extra_folders,
+            timeout_seconds=options["timeout"],
+            verbose=options["verbose"],
+            precheck=options["precheck"],
+            stitch_mode=options["stitch"],
+            plan=plan,
+            progress=progress,
+            layout=layout,
+            row_cache=options.get("row_cache", False),
+            trace=trace,
+            raw_sheet=options.get("raw_sheet"),
+        )
+        if options.get("optimize"):
+            report_progress(progress, "optimize")
+            with trace_span(trace, "optimize"):
+                before, after = optimize_png(staging_path)
+            print(f"Optimized {output_name}: {format_savings(before, after)}")
+            logging.info("Optimized %s: %s", output_name, format_savings(before, after))
+            if stats is not None:
+                add_stats(stats, {"sheets": 1, "bytes_before": before, "bytes_after": after})
+        for file_path, file_name in output_files:
+            os.replace(os.path.join(staging_dir, file_name), file_path)
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        elapsed = time.time() - start_time
+        print(f"Built {output_name} in {elapsed:.1f}s")
+        logging.info("Built %s in %.1fs", output_name, elapsed)
+        manifest = write_manifest(manifest_path, output_path, inputs, config_hash)
+        report_progress(progress, "copy")
+        with trace_span(trace, "copy"):
+            distribute_outputs(
+                output_files,
+                object_type,
+                config,
+                trace,
+                {output_path: manifest["output"]["sha256"]},
+            )
+        return "built"
+    except (RuntimeError, subprocess.TimeoutExpired, OSError) as exc:
+        if staging_dir:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        print(f"Error in {name}: {exc}", file=sys.stderr)
+        logging.error("Error in %s: %s", name, exc)
+        return "error"
+    finally:
+        if trace is not None:
+            trace.close(stats)
+        if stats is not None:
+            hits, misses = FRAME_CACHE.counters()
+            add_stats(
+                stats,
+                {
+                    "frame_cache_hits": hits - cache_hits,
+                    "frame_cache_misses": misses - cache_misses,
+                },
+            )
+
+
+def _init_worker(log_file, frame_cache_bytes):
+    logging.basicConfig(
+        filename=log_file,
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+    FRAME_CACHE.resize(frame_cache_bytes)
+
+
+def build_folder_captured(task):
+    # Buffer the folder's console output so parallel builds never interleave lines.
+    out = io.StringIO()
+    err = io.StringIO()
+    stats = {}
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+        try:
+            status = build_folder(*task, stats=stats)
+        except Exception as exc:
+            print(f"Error in {task[0]}: {exc}", file=sys.stderr)
+            logging.exception("Error in %s", task[0])
+            status = "error"
+    # Per-folder wall time for the build history; main() takes it out of the totals.
+    stats["build_seconds"] = time.perf_counter() - start_time
+    return task[0], status, out.getvalue(), err.getvalue(), stats
+
+
+def _worker_pool(jobs, log_file, frame_cache_bytes, mp_context):
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=jobs,
+        mp_context=mp_context,
+        initializer=_init_worker,
+        initargs=(log_file, frame_cache_bytes),
+    )
+
+
+def _folder_error(name, message):
+    logging.error("Error in %s: %s", name, message)
+    return name, "error", "", f"Error in {name}: {message}\n", {}
+
+
+def run_parallel(tasks, jobs, log_file, frame_cache_bytes=0, mp_context=None):
+    # mp_context lets multithreaded callers (the bridge) avoid forking while other
+    # threads may hold locks; the CLI keeps the platform default.
+    casualties = []
+    with _worker_pool(jobs, log_file, frame_cache_bytes, mp_context) as pool:
+        futures = {pool.submit(build_folder_captured, task): task for task in tasks}
+        for future in concurrent.futures.as_completed(futures):
+            task = futures[future]
+            try:
+                yield future.result()
+            except concurrent.futures.BrokenExecutor:
+                # A dead worker breaks every pending future, not just its own.
+                casualties.append(task)
+            except Exception as exc:
+                yield _folder_error(task[0], exc)
+
+    # Retry each casualty alone in a one-worker pool, so only the folder that
+    # crashes again is an error and the others still build or skip.
+    running = {}
+    try:
+        while casualties or running:
+            while casualties and len(running) < jobs:
+                task = casualties.pop(0)
+                pool = _worker_pool(1, log_file, frame_cache_bytes, mp_context)
+                running[pool.submit(build_folder_captured, task)] = (task, pool)
+            done, _ = concurrent.futures.wait(
+                running, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                task, pool = running.pop(future)
+                pool.shutdown()
+                try:
+                    yield future.result()
+                except concurrent.futures.BrokenExecutor:
+                    yield _folder_error(task[0], "worker process died")
+                except Exception as exc:
+                    yield _folder_error(task[0], exc)
+    finally:
+        for _, pool in running.values():
+            pool.shutdown(cancel_futures=True)
+
+
+HISTORY_VERSION = 1
+# Cost of a folder never built before, until the history has its own average.
+DEFAULT_MS_PER_FRAME = 5.0
+
+
+def count_frames(folder):
+    # Frames live in the action subfolders; the sheet and hidden caches do not count.
+    count = 0
+    for entry in os.scandir(folder):
+        if not entry.is_dir() or entry.name.startswith("."):
+            continue
+        for _, dirnames, filenames in os.walk(entry.path):
+            dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+            count += sum(1 for name in filenames if name.lower().endswith(".png"))
+    return count
+
+
+class BuildHistory:
+    # Per-folder build durations and frame counts from earlier runs, kept in one
+    # JSON file in the library root. Only a scheduling hint: a bad file starts empty.
+    def __init__(self, path):
+        self.path = path
+        self.folders = {}
+        try:
+            if path:
+                with open(path, "r", encoding="utf-8") as handle:
+                    data = json.load(handle)
+                if isinstance(data, dict) and data.get("version") == HISTORY_VERSION:
+                    self.folders = dict(data.get("folders", {}))
+        except (OSError, ValueError):
+            pass
+        samples = [
+            (entry["built_ms"], entry["frames"])
+            for entry in self.folders.values()
+            if entry.get("built_ms") and entry.get("frames")
+        ]
+        frames = sum(count for _, count in samples)
+        self.ms_per_frame = (
+            sum(ms for ms, _ in samples) / frames if frames else DEFAULT_MS_PER_FRAME
+        )
+        self.mean_frames = frames / len(samples) if samples else 1
+
+    def estimate_ms(self, name, frames=None, force_rebuild=False):
+        # Expected cost of this run: an incremental run mostly re-checks and copies
+        # sheets that were skipped before; otherwise a full rebuild, scaled when the
+        # frame count changed. A folder that did change runs longer than estimated
+        # and BuildEta catches up from the observed rate. Without a current frame
+        # count the recorded one (or the average folder) is used.
+        entry = self.folders.get(name, {})
+        if not force_rebuild and entry.get("skipped_ms"):
+            return entry["skipped_ms"]
+        built_ms = entry.get("built_ms")
+        if not built_ms:
+            return max(frames or entry.get("frames") or self.mean_frames, 1) * self.ms_per_frame
+        if entry.get("frames") and frames:
+            return built_ms * frames / entry["frames"]
+        return built_ms
+
+    def record(self, name, status, seconds, frames):
+        if status not in ("built", "skipped"):
+            return
+        entry = self.folders.setdefault(name, {})
+        key = f"{status}_ms"
+        ms = seconds * 1000
+        # Moving average so one slow outlier run does not dominate the schedule.
+        entry[key] = round(0.5 * entry[key] + 0.5 * ms if entry.get(key) else ms, 1)
+        if frames:
+            entry["frames"] = frames
+        entry["updated"] = int(time.time())
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump({"version": HISTORY_VERSION, "folders": self.folders}, handle, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+class BuildEta:
+    # Remaining time from the expected cost still queued and the rate observed so
+    # far, so skipped folders and parallel workers are accounted for on the fly.
+    def __init__(self, expected_ms, jobs):
+        self.expected_ms = expected_ms
+        self.jobs = jobs
+        self.remaining_ms = sum(expected_ms.values())
+        self.done_ms = 0.0
+        self.started = time.time()
+
+    def finish(self, name):
+        cost = self.expected_ms.get(name, 0.0)
+        self.remaining_ms -= cost
+        self.done_ms += cost
+
+    def seconds_left(self):
+        if self.remaining_ms <= 0:
+            return 0.0
+        elapsed = time.time() - self.started
+        if self.done_ms > 0 and elapsed > 0:
+            return elapsed * self.remaining_ms / self.done_ms
+        return self.remaining_ms / 1000 / self.jobs
+
+    def suffix(self):
+        seconds = int(self.seconds_left() + 0.5)
+        if seconds <= 0:
+            return ""
+        if seconds < 60:
+            return f", ETA {seconds}s"
+        if seconds < 3600:
+            return f", ETA {seconds // 60}m{seconds % 60:02d}s"
+        return f", ETA {seconds // 3600}h{seconds // 60 % 60:02d}m"
+
+
+def schedule_longest_first(candidates, expected_ms):
+    # LPT: with parallel workers the biggest sheets start first instead of running
+    # alone at the end. Ties keep the scan order.
+    return sorted(candidates, key=lambda entry: -expected_ms[entry[0]])
+
+
+def shard_of(name, count):
+    # Stable across machines and Python runs (unlike hash()); 1-based like --shard.
+    digest = hashlib.sha256(name.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
+
+
+COORDINATOR_POLL_SECONDS = 1.0
+# A job whose worker stops heartbeating is re-queued once, like a crashed
+# --jobs worker, and only then counted as an error.
+COORDINATOR_MAX_ATTEMPTS = 2
+WORKER_RETRIES = 5
+
+
+class Coordinator:
+    # Shared job queue for --coordinator: workers lease one folder at a time over
+    # HTTP and must heartbeat to keep it; expired leases go back to the queue.
+    def __init__(self, tasks, lease_seconds):
+        self.tasks = {task[0]: task for task in tasks}
+        self.pending = collections.deque(self.tasks)
+        self.leases = {}
+        self.attempts = {}
+        self.finished = set()
+        self.workers = set()
+        self.released = set()
+        self.lease_seconds = lease_seconds
+        self.results = queue.Queue()
+        self.lock = threading.Lock()
+
+    def expire(self, now):
+        for name, (worker, deadline) in list(self.leases.items()):
+            if deadline >= now:
+                continue
+            del self.leases[name]
+            logging.warning("Lease on %s expired (worker %s)", name, worker)
+            if self.attempts[name] >= COORDINATOR_MAX_ATTEMPTS:
+                message = f"Error in {name}: worker {worker} stopped responding\n"
+                self.finish(name, "error", "", message, {})
+            else:
+                self.pending.appendleft(name)
+
+    def finish(self, name, status, out, err, stats):
+        self.finished.add(name)
+        self.results.put((name, status, out, err, stats))
+
+    def lease(self, worker):
+        now = time.time()
+        with self.lock:
+            self.workers.add(worker)
+            self.expire(now)
+            if len(self.finished) == len(self.tasks):
+                self.released.add(worker)
+                return {"done": True}
+            if not self.pending:
+                return {"wait": COORDINATOR_POLL_SECONDS}
+            name = self.pending.popleft()
+            self.attempts[name] = self.attempts.get(name, 0) + 1
+            self.leases[name] = (worker, now + self.lease_seconds)
+            task = self.tasks[name]
+            return {
+                "job": {
+                    "name": name,
+                    "index": task[5],
+                    "total": len(self.tasks),
+                    # The coordinator's resolved --rebuild-all/--prompt answer.
+                    "force_rebuild": task[4]["force_rebuild"],
+                },
+                "lease_seconds": self.lease_seconds,
+            }
+
+    def heartbeat(self, worker, name):
+        with self.lock:
+            lease = self.leases.get(name)
+            if not lease or lease[0] != worker:
+                return False
+            self.leases[name] = (worker, time.time() + self.lease_seconds)
+            return True
+
+    def complete(self, worker, name, status, out, err, stats):
+        # The first result wins, even from a worker whose lease already expired.
+        with self.lock:
+            if name not in self.tasks or name in self.finished:
+                return False
+            self.leases.pop(name, None)
+            if name in self.pending:
+                self.pending.remove(name)
+            self.finish(name, status, out, err, stats)
+            return True
+
+    def drained(self):
+        with self.lock:
+            return self.workers <= self.released
+
+    def iter_results(self):
+        for _ in range(len(self.tasks)):
+            while True:
+                try:
+                    yield self.results.get(timeout=COORDINATOR_POLL_SECONDS)
+                    break
+                except queue.Empty:
+                    with self.lock:
+                        self.expire(time.time())
+
+
+class CoordinatorHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        coordinator = self.server.coordinator
+        try:
+            length = int(self.headers.get("Content-Length", "0"))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            worker = str(payload["worker"])
+            if self.path == "/lease":
+                reply = coordinator.lease(worker)
+            elif self.path == "/heartbeat":
+                reply = {"ok": coordinator.heartbeat(worker, payload["name"])}
+            elif self.path == "/complete":
+                reply = {
+                    "ok": coordinator.complete(
+                        worker,
+                        payload["name"],
+                        payload["status"],
+                        payload.get("stdout", ""),
+                        payload.get("stderr", ""),
+                        payload.get("stats", {}),
+                    )
+                }
+            else:
+                self.send_error(404)
+                return
+        except (KeyError, ValueError) as exc:
+            self.send_error(400, str(exc))
+            return
+        body = json.dumps(reply).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        return
+
+
+def parse_address(value):
+    host, _, port = value.rpartition(":")
+    try:
+        return host or "0.0.0.0", int(port)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(
+            f"Invalid address '{value}', expected HOST:PORT"
+        ) from exc
+
+
+def run_coordinator(tasks, address, lease_seconds, worker_argv=None, local_workers=0):
+    coordinator = Coordinator(tasks, lease_seconds)
+    server = ThreadingHTTPServer(address, CoordinatorHandler)
+    server.daemon_threads = True
+    server.coordinator = coordinator
+    threading.Thread(target=server.serve_forever, name="coordinator", daemon=True).start()
+    host, port = server.server_address[:2]
+    url = f"http://{'127.0.0.1' if host == '0.0.0.0' else host}:{port}"
+    print(f"Coordinator on {host}:{port} with {len(tasks)} job(s)")
+    logging.info("Coordinator on %s:%d with %d job(s)", host, port, len(tasks))
+    workers = [
+        subprocess.Popen(worker_argv + ["--worker", url], stdout=subprocess.DEVNULL)
+        for _ in range(local_workers)
+    ]
+    try:
+        yield from coordinator.iter_results()
+        # Keep answering "done" until every worker that polled has seen it.
+        deadline = time.time() + COORDINATOR_POLL_SECONDS * 3
+        while not coordinator.drained() and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        for proc in workers:
+            try:
+                proc.wait(timeout=COORDINATOR_POLL_SECONDS * 3)
+            except subprocess.TimeoutExpired:
+                proc.terminate()
+        server.shutdown()
+        server.server_close()
+
+
+def coordinator_call(url, endpoint, payload):
+    body = json.dumps(payload).encode("utf-8")
+    for attempt in range(WORKER_RETRIES):
+        request = urllib.request.Request(
+            f"{url.rstrip('/')}/{endpoint}",
+            data=body,
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return json.loads(response.read())
+        except (OSError, ValueError) as exc:
+            error = exc
+            time.sleep(min(2**attempt, 8) * 0.25)
+    raise RuntimeError(f"Coordinator {url} unreachable: {error}")
+
+
+def heartbeat_lease(url, worker, name, interval, stop):
+    while not stop.wait(interval):
+        try:
+            coordinator_call(url, "heartbeat", {"worker": worker, "name": name})
+        except RuntimeError as exc:
+            logging.warning("Heartbeat for %s failed: %s", name, exc)
+
+
+def run_worker(url, root, config, options, frames_overrides):
+    worker = f"{socket.gethostname()}-{os.getpid()}"
+    overrides = config.get("type_overrides", {})
+    counts = {"built": 0, "skipped": 0, "error": 0}
+    print(f"Worker {worker} pulling from {url}")
+    logging.info("Worker %s pulling from %s", worker, url)
+    try:
+        while True:
+            reply = coordinator_call(url, "lease", {"worker": worker})
+            if reply.get("done"):
+                break
+            if "job" not in reply:
+                time.sleep(reply.get("wait", COORDINATOR_POLL_SECONDS))
+                continue
+            job = reply["job"]
+            name = job["name"]
+            path = os.path.join(root, name)
+            object_type = classify_folder(name, overrides)
+            profile = config["profiles"].get(object_type)
+            if not os.path.isdir(path) or not profile:
+                message = f"Error in {name}: not a buildable folder on {worker}\n"
+                result = (name, "error", "", message, {})
+            else:
+                profile = apply_frames_overrides(profile, frames_overrides)
+                job_options = options
+                if job.get("force_rebuild") and not options["force_rebuild"]:
+                    job_options = dict(options, force_rebuild=True)
+                task = (
+                    name, path, object_type, profile, job_options, job["index"], job["total"]
+                )
+                stop = threading.Event()
+                beat = threading.Thread(
+                    target=heartbeat_lease,
+                    args=(url, worker, name, reply["lease_seconds"] / 3, stop),
+                    daemon=True,
+                )
+                beat.start()
+                try:
+                    result = build_folder_captured(task)
+                finally:
+                    stop.set()
+                    beat.join()
+            _, status, out, err, stats = result
+            counts[status] = counts.get(status, 0) + 1
+            print(f"{name}: {status}")
+            payload = {
+                "worker": worker,
+                "name": name,
+                "status": status,
+                "stdout": out,
+                "stderr": err,
+                "stats": stats,
+            }
+            coordinator_call(url, "complete", payload)
+    except RuntimeError as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+    print(
+        f"Worker done. Built: {counts['built']}, Skipped: {counts['skipped']}, "
+        f"Errors: {counts['error']}"
+    )
+    return 0
+
+
+WATCH_DEBOUNCE_SECONDS = 0.15
+WATCH_POLL_SECONDS = 0.25
+# Polling only rescans folders whose mtime changed; a full rescan this often also
+# catches frames overwritten in place, which leave the folder's mtime alone.
+WATCH_FULL_SCAN_SECONDS = 5.0
+# What the builder writes into an object folder itself (sheets, variants, atlas
+# sidecars, raw sheets, temp files); hidden caches and staging dirs start with ".".
+BUILDER_OUTPUT_SUFFIXES = (".png", ".json", ".rgba", ".tmp")
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+INOTIFY_MASK = (
+    IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+)
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class InotifyWatcher:
+    kind = "inotify"
+
+    def __init__(self, root):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.root = root
+        self.paths = {}
+        # Root, object folders and action folders; frames live two levels down.
+        self.add_tree(root, depth=0)
+
+    def add_tree(self, path, depth):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), INOTIFY_MASK)
+        if wd < 0:
+            return
+        self.paths[wd] = path
+        if depth >= 2:
+            return
+        try:
+            for name, child in list_dirs(path):
+                if not name.startswith("."):
+                    self.add_tree(child, depth + 1)
+        except OSError:
+            pass
+
+    def read(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped: treat every watched folder as changed.
+                changed.update(self.paths.values())
+                continue
+            base = self.paths.get(wd)
+            if base is None:
+                continue
+            if mask & IN_IGNORED:
+                self.paths.pop(wd, None)
+                continue
+            path = os.path.join(base, os.fsdecode(name)) if name else base
+            hidden = os.path.basename(path).startswith(".")
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and not hidden:
+                # Hidden dirs are the builder's own (.rowcache, .building-*): never watched.
+                depth = len(os.path.relpath(path, self.root).split(os.sep))
+                if depth <= 2:
+                    self.add_tree(path, depth)
+            changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    kind = "polling"
+
+    def __init__(self, root, interval=WATCH_POLL_SECONDS):
+        self.root = root
+        self.interval = interval
+        self.mtimes = {}
+        self.subdirs = {}
+        self.frames = {}
+        self.full_scan_at = 0.0
+        self.take_snapshot()
+
+    def scan_folder(self, path, full):
+        # (mtimes, action folders, frames) of one object folder; unchanged action
+        # folders reuse their previous frames without a stat per file.
+        mtimes = {path: os.stat(path).st_mtime_ns}
+        if not full and mtimes[path] == self.mtimes.get(path) and path in self.subdirs:
+            sub_paths = self.subdirs[path]
+        else:
+            sub_paths = [
+                sub_path for sub, sub_path in list_dirs(path) if not sub.startswith(".")
+            ]
+        frames = {}
+        for sub_path in sub_paths:
+            mtimes[sub_path] = os.stat(sub_path).st_mtime_ns
+            previous = self.frames.get(sub_path)
+            if full or previous is None or mtimes[sub_path] != self.mtimes.get(sub_path):
+                previous = {
+                    filename: (stat.st_size, stat.st_mtime_ns)
+                    for filename, stat in scan_pngs(sub_path)
+                }
+            frames[sub_path] = previous
+        return mtimes, sub_paths, frames
+
+    def take_snapshot(self):
+        # Updates the snapshot and returns the paths that changed since the last one.
+        full = time.monotonic() >= self.full_scan_at
+        if full:
+            self.full_scan_at = time.monotonic() + WATCH_FULL_SCAN_SECONDS
+        mtimes = {}
+        subdirs = {}
+        frames = {}
+        for name, path in list_dirs(self.root):
+            if name.startswith("."):
+                continue
+            try:
+                folder_mtimes, sub_paths, folder_frames = self.scan_folder(path, full)
+            except OSError:
+                # A transient error keeps the folder's previous state instead of
+                # dropping it, which would look like a change.
+                if path not in self.subdirs:
+                    continue
+                sub_paths = self.subdirs[path]
+                folder_mtimes = {
+                    key: self.mtimes[key] for key in [path, *sub_paths] if key in self.mtimes
+                }
+                folder_frames = {
+                    key: self.frames[key] for key in sub_paths if key in self.frames
+                }
+            mtimes.update(folder_mtimes)
+            subdirs[path] = sub_paths
+            frames.update(folder_frames)
+        changed = set(self.subdirs).symmetric_difference(subdirs)
+        for sub_path in set(self.frames) | set(frames):
+            before = self.frames.get(sub_path)
+            after = frames.get(sub_path)
+            if before is after:
+                continue
+            if before is None or after is None:
+                changed.add(sub_path)
+                continue
+            changed.update(
+                os.path.join(sub_path, filename)
+                for filename in set(before) | set(after)
+                if before.get(filename) != after.get(filename)
+            )
+        self.mtimes = mtimes
+        self.subdirs = subdirs
+        self.frames = frames
+        return changed
+
+    def read(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.interval
+            if deadline is not None:
+                wait = min(wait, max(0.0, deadline - time.monotonic()))
+            time.sleep(wait)
+            changed = self.take_snapshot()
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        pass
+
+
+def make_watcher(root, force_polling=False):
+    if not force_polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(root)
+
+
+def changed_folder(root, path):
+    parts = os.path.relpath(path, root).split(os.sep)
+    if not parts or any(part.startswith(".") for part in parts):
+        return None
+    if len(parts) == 2:
+        # Sheets and manifests are written at this level; only folders matter.
+        if os.path.splitext(parts[1])[1].lower() in BUILDER_OUTPUT_SUFFIXES:
+            return None
+    elif len(parts) >= 3 and not parts[-1].lower().endswith(".png"):
+        return None
+    return parts[0]
+
+
+def watch_and_rebuild(
+    root, config, options, frames_overrides, include_items, only=None, items_only=False
+):
+    watcher = make_watcher(root)
+    print(f"Watching {root} ({watcher.kind}), Ctrl+C to stop.")
+    logging.info("Watch start: %s (%s)", root, watcher.kind)
+    overrides = config.get("type_overrides", {})
+    try:
+        while True:
+            changed = watcher.read(None)
+            # Debounce: keep collecting until saves have been quiet for a moment.
+            while True:
+                more = watcher.read(WATCH_DEBOUNCE_SECONDS)
+                if not more:
+                    break
+                changed |= more
+            folders = {changed_folder(root, path) for path in changed}
+            for name in sorted(folder for folder in folders if folder):
+                if only and name.lower() != only.lower():
+                    continue
+                path = os.path.join(root, name)
+                if not os.path.isdir(path):
+                    continue
+                object_type = classify_folder(name, overrides)
+                profile = config["profiles"].get(object_type)
+                if not profile or (object_type == "item" and not include_items):
+                    continue
+                if items_only and object_type != "item":
+                    continue
+                profile = apply_frames_overrides(profile, frames_overrides)
+                start_time = time.time()
+                stats = {}
+                try:
+                    status = build_folder(name, path, object_type, profile, options, 1, 1, stats)
+                except Exception as exc:
+                    # One bad folder (e.g. an invalid output name) must not stop the watcher.
+                    print(f"Error in {name}: {exc}", file=sys.stderr)
+                    logging.exception("Error in %s", name)
+                    continue
+                if status == "built":
+                    print(
+                        f"Updated {name} in {time.time() - start_time:.2f}s "
+                        f"(frame cache: {stats['frame_cache_hits']} hits, "
+                        f"{stats['frame_cache_misses']} misses)"
+                    )
+    except KeyboardInterrupt:
+        print("Watch stopped.")
+    finally:
+        watcher.close()
+    return 0
+
+
+def apply_frames_overrides(profile, frames_overrides):
+    if not frames_overrides:
+        return profile
+    profile = profile.copy()
+    profile_frames = dict(profile.get("frames_per_view", {}))
+    profile_frames.update(frames_overrides)
+    profile["frames_per_view"] = profile_frames
+    return profile
+
+
+def make_options(args, config, magick_cmds, force_rebuild):
+    return {
+        "config": config,
+        "magick_cmds": magick_cmds,
+        "force_rebuild": force_rebuild,
+        "dry_run": args.dry_run,
+        "timeout": args.timeout,
+        "verbose": args.verbose,
+        "precheck": args.precheck,
+        "stitch": args.stitch,
+        "json": args.json,
+        "layout": args.layout,
+        "optimize": args.optimize,
+        "row_cache": not args.no_row_cache,
+        "trace": bool(args.trace),
+        "raw_sheet": args.raw_sheet,
+    }
+
+
+def worker_command(argv):
+    # Local workers rerun this command line minus the coordinator-only flags.
+    dropped = ("--coordinator", "--local-workers", "--shard", "--only", "--watch", "--prompt")
+    command = [sys.executable, os.path.abspath(__file__)]
+    skip = False
+    for arg in argv:
+        if skip:
+            skip = False
+            continue
+        flag = arg.split("=", 1)[0]
+        if flag in dropped:
+            skip = "=" not in arg and flag not in ("--watch", "--prompt")
+            continue
+        command.append(arg)
+    return command
 
 
 def main():
@@ -487,10 +2725,16 @@ def main():
         action="store_true",
         help="Scan and report without writing outputs.",
     )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="With --dry-run, print a JSON array of build plans on stdout "
+        "(progress goes to stderr).",
+    )
     parser.add_argument(
         "--rebuild-all",
         action="store_true",
-        help="Rebuild all matching folders regardless of timestamps.",
+        help="Rebuild all matching folders regardless of the build manifest.",
     )
     parser.add_argument(
         "--prompt",
@@ -516,13 +2760,46 @@ def main():
     parser.add_argument(
         "--precheck",
         action="store_true",
-        help="Validate PNGs with ImageMagick identify before montage.",
+        help="Validate PNG structure, CRCs and frame size before stitching.",
     )
     parser.add_argument(
         "--stitch",
-        choices=["montage", "append"],
+        choices=["montage", "append", "native", "stream"],
         default="montage",
-        help="Stitching method for sprite sheets.",
+        help="Stitching method for sprite sheets (native decodes in-process; stream also "
+        "encodes row by row with bounded memory; both need Pillow).",
+    )
+    parser.add_argument(
+        "--layout",
+        choices=["grid", "atlas"],
+        default="grid",
+        help="grid: fixed frame_size cells; atlas: trimmed, deduplicated frames "
+        "packed into a power-of-two sheet with a JSON sidecar (needs Pillow).",
+    )
+    parser.add_argument(
+        "--no-row-cache",
+        action="store_true",
+        help="Do not reuse cached row strips (.rowcache) for native/append stitching.",
+    )
+    parser.add_argument(
+        "--optimize",
+        action="store_true",
+        help="Losslessly shrink each built PNG (exact palette when <= 256 colors, "
+        "best zlib strategy) and report bytes saved (needs Pillow).",
+    )
+    parser.add_argument(
+        "--raw-sheet",
+        choices=RAW_SHEET_COMPRESSIONS,
+        help="Also write <name>.rgba: premultiplied RGBA frames behind a small header, "
+        "memory-mappable (raw) or with per-frame zlib blocks (needs Pillow).",
+    )
+    parser.add_argument(
+        "--frame-cache-mb",
+        type=int,
+        default=None,
+        help="With --watch, memory budget for decoded frames kept between rebuilds "
+        "(default: frame_cache_mb from the config, 256; 0 disables). One-shot runs "
+        "never cache frames.",
     )
     parser.add_argument(
         "--frames-per-view",
@@ -530,6 +2807,65 @@ def main():
         default=[],
         help="Override frames per view, e.g. idle=24 (repeatable).",
     )
+    parser.add_argument(
+        "--trace",
+        help="Write per-phase spans (Chrome trace-event JSON, open in chrome://tracing "
+        "or Perfetto) plus a per-folder timing summary to this file.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="After the initial pass, keep running and rebuild folders as frames change.",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Folders to build in parallel (default: CPU count, 1 = sequential). "
+        "Progress lines show [i/N] with i the folder's position in the build order "
+        "(largest expected cost first when parallel), so parallel lines arrive out of order.",
+    )
+    parser.add_argument(
+        "--history",
+        default=".build_history.json",
+        help="Per-folder build durations and frame counts, used to start the biggest "
+        "folders first with --jobs and to print an ETA.",
+    )
+    parser.add_argument(
+        "--no-history",
+        action="store_true",
+        help="Neither read nor update the build history.",
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        help="Build only shard i of N (e.g. 2/4), split by a stable hash of the folder name.",
+    )
+    parser.add_argument(
+        "--coordinator",
+        type=parse_address,
+        metavar="HOST:PORT",
+        help="Serve the folder jobs on HOST:PORT for --worker processes to pull, "
+        "then print the combined summary.",
+    )
+    parser.add_argument(
+        "--local-workers",
+        type=int,
+        default=0,
+        help="With --coordinator, also start this many workers on this machine.",
+    )
+    parser.add_argument(
+        "--lease-timeout",
+        type=int,
+        default=60,
+        help="Seconds without a heartbeat before a worker's job is re-queued.",
+    )
+    parser.add_argument(
+        "--worker",
+        metavar="URL",
+        help="Pull and build folder jobs from a --coordinator at URL, run from the "
+        "same library root.",
+    )
     parser.add_argument(
         "--only",
         help="Process only a specific folder name (case-insensitive).",
@@ -545,15 +2881,63 @@ def main():
         help="Include I_ item folders in the default run.",
     )
     args = parser.parse_args()
+    if not (args.dry_run and args.json):
+        return build_all(args)
+    # stdout carries a single JSON array of plans; progress and summaries go to stderr.
+    plans = []
+    with contextlib.redirect_stdout(sys.stderr):
+        status = build_all(args, plans)
+    print(json.dumps(plans, indent=2))
+    return status
 
+
+def build_all(args, plans=None):
     config = load_config(args.config)
     try:
         frames_overrides = parse_frames_per_view_overrides(args.frames_per_view)
     except ValueError as exc:
         print(f"Error: {exc}", file=sys.stderr)
         return 1
+    if args.jobs is not None and args.jobs < 1:
+        print("Error: --jobs must be >= 1", file=sys.stderr)
+        return 1
+    if args.worker and (args.coordinator or args.watch):
+        print(
+            "Error: --worker cannot be combined with --coordinator or --watch", file=sys.stderr
+        )
+        return 1
+    if args.coordinator and args.watch:
+        print("Error: --coordinator cannot be combined with --watch", file=sys.stderr)
+        return 1
+    if args.local_workers < 0 or (args.local_workers and not args.coordinator):
+        print("Error: --local-workers needs --coordinator and must be >= 0", file=sys.stderr)
+        return 1
+    if args.lease_timeout < 1:
+        print("Error: --lease-timeout must be >= 1", file=sys.stderr)
+        return 1
+    frame_cache_mb = (
+        args.frame_cache_mb if args.frame_cache_mb is not None else config["frame_cache_mb"]
+    )
+    if frame_cache_mb < 0:
+        print("Error: --frame-cache-mb must be >= 0", file=sys.stderr)
+        return 1
+    if args.watch:
+        FRAME_CACHE.resize(frame_cache_mb * 1024 * 1024)
     magick_cmds = find_magick()
-    if not magick_cmds:
+    if (
+        args.stitch in ("native", "stream")
+        or args.layout == "atlas"
+        or args.optimize
+        or args.raw_sheet
+    ):
+        if Image is None:
+            print(
+                "Error: Pillow is required for --stitch native/stream, --layout atlas, "
+                "--optimize and --raw-sheet.",
+                file=sys.stderr,
+            )
+            return 1
+    elif not magick_cmds:
         print("Error: ImageMagick (magick or convert) is required.", file=sys.stderr)
         return 1
 
@@ -564,6 +2948,10 @@ def main():
         format="%(asctime)s %(levelname)s %(message)s",
     )
 
+    if args.worker:
+        options = make_options(args, config, magick_cmds, args.rebuild_all)
+        return run_worker(args.worker, root, config, options, frames_overrides)
+
     processed = 0
     skipped = 0
     errors = 0
@@ -598,9 +2986,13 @@ def main():
         if not candidates:
             print("No item folders found for --items-only", file=sys.stderr)
             return 1
+    if args.shard:
+        index, count = args.shard
+        candidates = [entry for entry in candidates if shard_of(entry[0], count) == index]
+        print(f"Shard {index}/{count}: {len(candidates)} folder(s)")
 
     total = len(candidates)
-    if total == 0:
+    if total == 0 and not args.watch:
         print("No valid folders found.", file=sys.stderr)
         return 0
 
@@ -609,123 +3001,135 @@ def main():
         reply = input("Rebuild all sprite sheets? [y/N]: ").strip().lower()
         force_rebuild = reply in ("y", "yes")
 
-    for idx, (name, path, object_type, profile) in enumerate(candidates, start=1):
-        if frames_overrides:
-            profile = profile.copy()
-            profile_frames = dict(profile.get("frames_per_view", {}))
-            profile_frames.update(frames_overrides)
-            profile["frames_per_view"] = profile_frames
-        print(
-            f"[{idx}/{total}] Checking {name} "
-            f"(built {processed}, skipped {skipped}, errors {errors})"
-        )
+    options = make_options(args, config, magick_cmds, force_rebuild)
+    jobs = args.jobs if args.jobs is not None else (os.cpu_count() or 1)
+    parallel = bool(args.coordinator) or (jobs > 1 and total > 1)
+    history = BuildHistory(None if args.no_history else args.history)
+    frame_counts = {}
+    if parallel:
+        # Only LPT needs current frame counts up front; builds report theirs in stats.
+        frame_counts = {name: count_frames(path) for name, path, _, _ in candidates}
+    expected_ms = {
+        name: history.estimate_ms(name, frame_counts.get(name), force_rebuild)
+        for name, _, _, _ in candidates
+    }
+    if parallel:
+        candidates = schedule_longest_first(candidates, expected_ms)
+    eta = BuildEta(expected_ms, max(1, args.local_workers) if args.coordinator else jobs)
 
-        output_base = output_name_for_folder(name)
-        output_base = validate_output_base(output_base, name)
-        output_name = f"{output_base}.png"
-        if not output_name or output_name == ".png":
-            print(f"Skipping {name}: invalid output name")
-            skipped += 1
-            continue
-        output_path = os.path.join(path, output_name)
+    tasks = []
+    for idx, (name, path, object_type, profile) in enumerate(candidates, start=1):
+        profile = apply_frames_overrides(profile, frames_overrides)
+        tasks.append((name, path, object_type, profile, options, idx, total))
 
-        try:
-            latest_input_mtime = 0.0
-            subdirs = [d for d, _ in list_dirs(path)]
-            ordered_attack_folders = pick_ordered_attack_folders(subdirs)
-            extra_attack_folders = []
-            if name.lower() == "w_shield":
-                extra_attack_folders = pick_extra_attack_folders(
-                    subdirs, config.get("attack_extra_folders", [])
-                )
-            for action in profile["actions"]:
-                if action == "attack":
-                    folder = pick_attack_folder(
-                        subdirs, config["attack_folder_priority"]
-                    )
-                    folders = [folder] if folder else []
-                else:
-                    folder = find_folder_case_insensitive(subdirs, action)
-                    folders = [folder] if folder else []
-                if not folders:
-                    raise RuntimeError(f"Missing '{action}' folder")
-                for folder in folders:
-                    full_path = os.path.join(path, folder)
-                    files = list_pngs(full_path)
-                    if not files:
-                        raise RuntimeError(f"No PNGs in {full_path}")
-                    for filename in files:
-                        mtime = os.path.getmtime(os.path.join(full_path, filename))
-                        if mtime > latest_input_mtime:
-                            latest_input_mtime = mtime
-            for folder in ordered_attack_folders:
-                full_path = os.path.join(path, folder)
-                files = list_pngs(full_path)
-                if not files:
-                    raise RuntimeError(f"No PNGs in {full_path}")
-                for filename in files:
-                    mtime = os.path.getmtime(os.path.join(full_path, filename))
-                    if mtime > latest_input_mtime:
-                        latest_input_mtime = mtime
-            for folder in extra_attack_folders:
-                if folder in ordered_attack_folders:
-                    continue
-                full_path = os.path.join(path, folder)
-                files = list_pngs(full_path)
-                if not files:
-                    raise RuntimeError(f"No PNGs in {full_path}")
-                for filename in files:
-                    mtime = os.path.getmtime(os.path.join(full_path, filename))
-                    if mtime > latest_input_mtime:
-                        latest_input_mtime = mtime
-            if not needs_rebuild(output_path, latest_input_mtime, force_rebuild):
-                if not args.dry_run and os.path.isfile(output_path):
-                    copy_to_targets(output_path, output_name, object_type, config)
+    # Position of each folder in the build order, for the [i/N] progress prefix.
+    order = {task[0]: task[5] for task in tasks}
+    totals = {}
+    results = None
+    if args.coordinator:
+        results = run_coordinator(
+            tasks,
+            args.coordinator,
+            args.lease_timeout,
+            worker_command(sys.argv[1:]),
+            args.local_workers,
+        )
+    elif parallel:
+        results = run_parallel(
+            tasks, min(jobs, total), args.log_file, FRAME_CACHE.budget
+        )
+    if results is not None:
+        for name, status, out, err, stats in results:
+            eta.finish(name)
+            print(
+                f"[{order[name]}/{total}] Checked {name} "
+                f"(built {processed}, skipped {skipped}, errors {errors}{eta.suffix()})"
+            )
+            sys.stdout.write(out)
+            sys.stdout.flush()
+            sys.stderr.write(err)
+            sys.stderr.flush()
+            history.record(
+                name, status, stats.pop("build_seconds", 0.0), stats.pop("frames", None)
+            )
+            add_stats(totals, stats)
+            if status == "built":
+                processed += 1
+            elif status == "skipped":
                 skipped += 1
-                continue
-
-            if args.dry_run:
-                print(f"Would build: {name} ({idx}/{total})")
+            else:
+                errors += 1
+    else:
+        for task in tasks:
+            name, idx = task[0], task[5]
+            print(
+                f"[{idx}/{total}] Checking {name} "
+                f"(built {processed}, skipped {skipped}, errors {errors}{eta.suffix()})"
+            )
+            start_time = time.perf_counter()
+            stats = {}
+            status = build_folder(*task, stats=stats)
+            eta.finish(name)
+            history.record(
+                name, status, time.perf_counter() - start_time, stats.pop("frames", None)
+            )
+            add_stats(totals, stats)
+            if status == "built":
                 processed += 1
-                continue
+            elif status == "skipped":
+                skipped += 1
+            else:
+                errors += 1
 
-            if force_rebuild and not args.dry_run:
-                remove_existing_outputs(
-                    output_path, output_name, object_type, config
-                )
-            print(f"Building {name} ({idx}/{total})...")
-            logging.info("Start build: %s", name)
-            start_time = time.time()
-            build_sprite_sheet(
-                magick_cmds,
-                path,
-                output_path,
-                profile,
-                config["frame_size"],
-                profile.get("input_direction_order", config["input_direction_order"]),
-                config["attack_folder_priority"],
-                config.get("attack_extra_folders", [])
-                if name.lower() == "w_shield"
-                else [],
-                timeout_seconds=args.timeout,
-                verbose=args.verbose,
-                precheck=args.precheck,
-                stitch_mode=args.stitch,
+    if plans is not None:
+        plans.extend(sorted(totals.get("plans", []), key=lambda plan: order[plan["folder"]]))
+    if history.path and not args.dry_run and tasks:
+        try:
+            history.save()
+        except OSError as exc:
+            print(
+                f"Warning: could not write build history {history.path}: {exc}",
+                file=sys.stderr,
+            )
+    if totals.get("sheets"):
+        summary = format_savings(totals["bytes_before"], totals["bytes_after"])
+        print(f"Optimized {totals['sheets']} sheet(s): {summary}")
+        logging.info("Optimized %d sheet(s): %s", totals["sheets"], summary)
+    lookups = totals.get("frame_cache_hits", 0) + totals.get("frame_cache_misses", 0)
+    if lookups:
+        print(
+            f"Frame cache: {totals['frame_cache_hits']} hits, "
+            f"{totals['frame_cache_misses']} misses"
+        )
+        logging.info(
+            "Frame cache: %d hits, %d misses",
+            totals["frame_cache_hits"],
+            totals["frame_cache_misses"],
+        )
+    if args.trace:
+        try:
+            write_trace(
+                args.trace, totals.get("trace_events", []), totals.get("folder_timings", [])
             )
-            elapsed = time.time() - start_time
-            print(f"Built {output_name} in {elapsed:.1f}s")
-            logging.info("Built %s in %.1fs", output_name, elapsed)
-            copy_to_targets(output_path, output_name, object_type, config)
-            processed += 1
-        except (RuntimeError, subprocess.TimeoutExpired) as exc:
-            print(f"Error in {name}: {exc}", file=sys.stderr)
-            logging.error("Error in %s: %s", name, exc)
+            print(f"Wrote trace {args.trace}")
+        except OSError as exc:
+            print(f"Error writing trace {args.trace}: {exc}", file=sys.stderr)
             errors += 1
-
     print(
         f"Done. Built: {processed}, Skipped: {skipped}, Errors: {errors}",
         file=sys.stderr,
     )
+    if args.watch and not args.dry_run:
+        watch_options = dict(options, force_rebuild=False, trace=False)
+        return watch_and_rebuild(
+            root,
+            config,
+            watch_options,
+            frames_overrides,
+            args.items_only or args.include_items,
+            only=args.only,
+            items_only=args.items_only,
+        )
     return 0 if errors == 0 else 1
 
 